@@ -1,10 +1,17 @@
+import collections
+import copy
 import datetime
 import re
 import os.path
+import tempfile
 
 import decimal
 import holidays
 import pyach.field_lengths as field_lengths
+import pyach.progress as progress_module
+import pyach.reader as reader
+import pyach.sorting as sorting
+import pyach.streams as streams
 
 # Datetime formats
 day_format_string = r'%y%m%d'
@@ -46,6 +53,16 @@ SAVINGS_DEBIT = '37'
 PRE_SAVINGS_DEBIT = '38'
 REMIT_SAVINGS_DEBIT = '39'
 
+# Addenda sequence numbers are four digits.
+MAX_ADDENDA = 9999
+
+# Debit and credit transaction codes
+DEBIT_CODES = (CHECK_DEBIT, SAVINGS_DEBIT)
+CREDIT_CODES = (CHECK_DEPOSIT, SAVINGS_DEPOSIT)
+
+# Entries sent to one receiving DFI, and what they add up to.
+DFITotals = collections.namedtuple('DFITotals', 'entry_count total_debit_amount total_credit_amount')
+
 # Payment Type Codes
 SINGLE_ENTRY = 'S'
 RECURRING = 'R'
@@ -98,6 +115,51 @@ def get_effective_entry_date(effective_entry_date, as_date=False):
         return _date.strftime(day_format_string)
 
 
+def debit_total(entries):
+    return decimal.Decimal(sum(entry.amount for entry in entries if entry.transaction_code in DEBIT_CODES))
+
+
+def credit_total(entries):
+    return decimal.Decimal(sum(entry.amount for entry in entries if entry.transaction_code in CREDIT_CODES))
+
+
+def dfi_prefix(routing_number):
+    # The entry hash adds up the first 8 digits of each receiving DFI's routing number.
+    return str(routing_number)[:8]
+
+
+def dfi_hash_total(counts):
+    return sum(int(prefix) * count for prefix, count in counts.items() if prefix)
+
+
+def detail_count(entries):
+    return sum(1 + entry.addenda_count for entry in entries)
+
+
+class EntryList(list):
+    """A batch's entries. Appending only adds entries; every other change is counted in changes,
+    so the batch knows to count its entries per DFI again."""
+
+    def __init__(self, entries=()):
+        super().__init__(entries)
+        self.changes = 0
+
+    def _changed(method):
+        def change(self, *args):
+            self.changes += 1
+            return method(self, *args)
+        return change
+
+    __setitem__ = _changed(list.__setitem__)
+    __delitem__ = _changed(list.__delitem__)
+    __imul__ = _changed(list.__imul__)
+    insert = _changed(list.insert)
+    pop = _changed(list.pop)
+    remove = _changed(list.remove)
+    clear = _changed(list.clear)
+    del _changed
+
+
 class IDStore:
     def __init__(self):
         self.id = 0
@@ -116,19 +178,20 @@ class FileHeader:
 
     def __init__(self, destination_routing_number,
                  company_identification_number, destination_name, origin_name,
-                 reference_code):
+                 reference_code, file_id_modifier='A', creation_date=None, creation_time=None):
         self._destination_routing_number = str(destination_routing_number)
         self._company_identification_number = str(company_identification_number)
         self._destination_name = str(destination_name)
         self._origin_name = str(origin_name)
         self._reference_code = str(reference_code)
-        self._creation_date = today_with_format
-        self._creation_time = now_with_format
-        self._file_id_modifier = 'A'  # First file of the day has A. Subsequent files follow pattern A-Z/1-9
+        self._creation_date = today_with_format if creation_date is None else str(creation_date)
+        self._creation_time = now_with_format if creation_time is None else str(creation_time)
+        # First file of the day has A. Subsequent files follow pattern A-Z/0-9
+        self._file_id_modifier = str(file_id_modifier)
         self.file_header_record = ''
 
     def generate(self):
-        self.file_header_record += validate_field(self._record_type,
+        self.file_header_record = validate_field(self._record_type,
                                                   field_lengths.FILE_HEADER_LENGTHS['RECORD TYPE CODE'])
         self.file_header_record += validate_field(self._priority_code,
                                                   field_lengths.FILE_HEADER_LENGTHS['PRIORITY CODE'])
@@ -176,7 +239,7 @@ class FileControl:
         self.file_control_record = ''
 
     def generate(self):
-        self.file_control_record += validate_field(self._record_type,
+        self.file_control_record = validate_field(self._record_type,
                                                    field_lengths.FILE_CONTROL_LENGTHS['RECORD TYPE CODE'])
         self.file_control_record += validate_field(self._batch_count, field_lengths.FILE_CONTROL_LENGTHS['BATCH COUNT'],
                                                    SHIFT_RIGHT_ADD_ZERO)
@@ -209,7 +272,7 @@ class BatchHeader:
                  company_identification_number,
                  entry_class_code, entry_description, dfi_number, batch_number, id_store,
                  service_class=MIXED, description_date=today_with_format,
-                 effective_entry_delay=1):
+                 effective_entry_delay=1, spool_after=None):
         self.batch_control_record = None
         self.company_name = str(company_name)
         self.discretionary_data = str(discretionary_data)
@@ -222,30 +285,104 @@ class BatchHeader:
         self.originator_dfi_identification = str(dfi_number)
         self.batch_number = str(batch_number)
         self.batch_control_record = ''
-        self.entry_records = []
+        # Batches too big for memory can spool their entries to disk.
+        self._entry_changes = 0
+        self.entry_records = EntryList() if spool_after is None else SpooledEntryStore(spool_after)
         self.batch_header_record = ''
         self._id_store = id_store
+        self.template = None
+
+    @property
+    def entry_records(self):
+        return self._entry_records
+
+    @entry_records.setter
+    def entry_records(self, entries):
+        self._entry_records = entries
+        # Entries, debits and credits per DFI prefix, so the entry hash is a sum over DFIs.
+        # _dfi_state says what they were counted from.
+        self._dfi_totals = None
+        self._dfi_state = None
+        self._dfi_entry_count = 0
+        if isinstance(entries, (EntryList, SpooledEntryStore)) and not len(entries):
+            self._dfi_totals = collections.Counter(), collections.Counter(), collections.Counter()
+            self._dfi_state = self._entries_state()
+
+    def _entries_state(self):
+        # _entry_changes is bumped by this batch's entries when their routing number, code or amount changes.
+        return getattr(self._entry_records, 'changes', 0), self._entry_changes
+
+    def _count_dfis(self, entries, totals=None):
+        counts, debits, credits = totals or (collections.Counter(), collections.Counter(), collections.Counter())
+        for entry in entries:
+            if isinstance(entry, Entry):
+                entry.link(self)
+            prefix = dfi_prefix(entry.routing_number)
+            counts[prefix] += 1
+            if entry.transaction_code in DEBIT_CODES:
+                debits[prefix] += entry.amount
+            elif entry.transaction_code in CREDIT_CODES:
+                credits[prefix] += entry.amount
+        return counts, debits, credits
+
+    def _counted_dfis(self):
+        entries = self._entry_records
+        if not isinstance(entries, (EntryList, SpooledEntryStore)):
+            # A plain list can have changed in any way, so it's counted every time.
+            return self._count_dfis(entries)
+        state = self._entries_state()
+        if self._dfi_totals is None or self._dfi_state != state or self._dfi_entry_count > len(entries):
+            self._dfi_totals = self._count_dfis(entries)
+        elif self._dfi_entry_count < len(entries):
+            # Entries were appended without add_entry().
+            if isinstance(entries, EntryList):
+                self._count_dfis(entries[self._dfi_entry_count:], self._dfi_totals)
+            else:
+                self._dfi_totals = self._count_dfis(entries)
+        self._dfi_state = state
+        self._dfi_entry_count = len(entries)
+        return self._dfi_totals
+
+    @property
+    def is_spooled(self):
+        return isinstance(self.entry_records, SpooledEntryStore)
+
+    def close(self):
+        # Removes the temporary file of a spooled batch. Its entries can't be read after this.
+        if self.is_spooled:
+            self.entry_records.close()
 
     @property
     def total_debit_amount(self):
-        return decimal.Decimal(sum(
-            entry.amount for entry in self.entry_records if entry.transaction_code in (CHECK_DEBIT, SAVINGS_DEBIT)))
+        if self.is_spooled:
+            return self.entry_records.total_debit_amount
+        return debit_total(self.entry_records)
 
     @property
     def total_credit_amount(self):
-        return decimal.Decimal(sum(
-            entry.amount for entry in self.entry_records if entry.transaction_code in (CHECK_DEPOSIT, SAVINGS_DEPOSIT)))
+        if self.is_spooled:
+            return self.entry_records.total_credit_amount
+        return credit_total(self.entry_records)
+
+    @property
+    def dfi_counts(self):
+        return self._counted_dfis()[0]
 
     @property
     def entry_hash(self):
-        return sum(int(str(entry.routing_number)[:8]) for entry in self.entry_records if str(entry.routing_number))
+        return dfi_hash_total(self.dfi_counts)
 
     @property
     def entry_count(self):
-        return len(self.entry_records) + sum(entry.addenda_count for entry in self.entry_records)
+        if self.is_spooled:
+            return self.entry_records.entry_count
+        return detail_count(self.entry_records)
 
     def generate(self):
-        self.batch_header_record += validate_field(self._record_type,
+        if self.template is not None:
+            self.batch_header_record = self.template.render_header(self.batch_number)
+            return self.batch_header_record
+        self.batch_header_record = validate_field(self._record_type,
                                                    field_lengths.BATCH_HEADER_LENGTHS['RECORD TYPE CODE'])
         self.batch_header_record += validate_field(self.service_class,
                                                    field_lengths.BATCH_HEADER_LENGTHS['SERVICE CLASS CODE'],
@@ -285,6 +422,13 @@ class BatchHeader:
         return self.batch_header_record
 
     def finalize(self):
+        if self.template is not None:
+            self.batch_control_record = self.template.render_control(self.entry_count,
+                                                                     self.entry_hash,
+                                                                     self.total_debit_amount,
+                                                                     self.total_credit_amount,
+                                                                     self.batch_number)
+            return
         self.batch_control_record = BatchControl(self.entry_count,
                                                  self.entry_hash,
                                                  self.total_debit_amount,
@@ -294,12 +438,263 @@ class BatchHeader:
                                                  self.batch_number,
                                                  self.service_class).generate()
 
+    def sort_entries(self, key, max_in_memory=sorting.DEFAULT_MAX_IN_MEMORY):
+        if self.is_spooled:
+            sorted_entries = self.entry_records.sorted(key, max_in_memory)
+            self.entry_records.close()
+            self.entry_records = sorted_entries
+            return
+        # Trace numbers stay with their position, so they still ascend through the sorted batch.
+        entry_numbers = sorted(entry.entry_number for entry in self.entry_records)
+        self.entry_records = EntryList(self.entry_records[index]
+                                       for index in sorting.sort_order(self.entry_records, key, max_in_memory))
+        for entry, entry_number in zip(self.entry_records, entry_numbers):
+            entry.entry_number = entry_number
+
+    def records(self):
+        yield self.generate()
+        for entry in self.entry_records:
+            yield entry.generate()
+            for addenda in entry.addenda_records:
+                yield addenda.generate()
+        yield self.batch_control_record
+
     def add_entry(self, transaction_code, routing_number, account_number,
                   amount, identification_number, receiver_name, discretionary_data=''):
         _entry = Entry(transaction_code, routing_number, account_number,
                        amount, identification_number, receiver_name,
                        discretionary_data, self.originator_dfi_identification, self._id_store.get_id())
-        self.entry_records.append(_entry)
+        counted = (self._dfi_totals is not None and self._dfi_state == self._entries_state() and
+                   self._dfi_entry_count == len(self._entry_records))
+        self._entry_records.append(_entry)
+        if counted:
+            self._count_dfis((_entry,), self._dfi_totals)
+            self._dfi_entry_count += 1
+
+    def dfi_breakdown(self, breakdown=None):
+        """Adds the entry count, debit and credit totals of every DFI prefix in this batch to breakdown."""
+        breakdown = {} if breakdown is None else breakdown
+        counts, debits, credits = self._counted_dfis()
+        for prefix, count in counts.items():
+            totals = breakdown.get(prefix, DFITotals(0, 0, 0))
+            breakdown[prefix] = DFITotals(totals.entry_count + count,
+                                          totals.total_debit_amount + debits[prefix],
+                                          totals.total_credit_amount + credits[prefix])
+        return breakdown
+
+
+class SpooledRecord:
+    __slots__ = ('_record',)
+
+    def __init__(self, record):
+        self._record = record
+
+    def generate(self):
+        return self._record
+
+
+class SpooledEntry(SpooledRecord):
+    """An entry read back from a spool, with its fields taken from the rendered record."""
+    __slots__ = ('addenda_records',)
+
+    def __init__(self, record):
+        super().__init__(record)
+        self.addenda_records = []
+
+    def _field(self, name):
+        return self._record[field_lengths.ENTRY_SLICES[name]].strip()
+
+    @property
+    def addenda_count(self):
+        return len(self.addenda_records)
+
+    @property
+    def transaction_code(self):
+        return self._field('TRANSACTION CODE')
+
+    @property
+    def routing_number(self):
+        return self._field('RECEIVING DFI ID')
+
+    @property
+    def account_number(self):
+        return self._field('DFI ACCOUNT NUMBER')
+
+    @property
+    def amount(self):
+        return decimal.Decimal(self._field('DOLLAR AMOUNT')).scaleb(-2)
+
+    @property
+    def identification_number(self):
+        return self._field('INDIVIDUAL IDENTIFICATION')
+
+    @property
+    def receiver_name(self):
+        return self._field('INDIVIDUAL NAME')
+
+    @property
+    def discretionary_data(self):
+        return self._field('DISCRETIONARY DATA')
+
+    @property
+    def trace_number(self):
+        return self._field('TRACE NUMBER')
+
+    @property
+    def entry_number(self):
+        return int(self.trace_number[-7:])
+
+
+class SpooledEntryStore:
+    """Holds a batch's entries, writing all but the newest to a temporary file once there are more than
+    max_in_memory of them. Totals for the spooled entries are kept as they're written."""
+
+    def __init__(self, max_in_memory):
+        self.max_in_memory = max_in_memory
+        self._entries = []
+        self._spool = None
+        self._spooled_count = 0
+        self._spooled_debit = decimal.Decimal(0)
+        self._spooled_credit = decimal.Decimal(0)
+        self._spooled_detail_count = 0
+
+    def __len__(self):
+        return self._spooled_count + len(self._entries)
+
+    def __getitem__(self, index):
+        # Only entries that are still in memory can be changed, e.g. entry_records[-1].add_addenda().
+        if -len(self._entries) <= index < 0:
+            return self._entries[index]
+        raise IndexError('Only the most recent entries of a spooled batch can be indexed')
+
+    def __iter__(self):
+        if self._spool is not None:
+            self._spool.seek(0)
+            entry = None
+            for record in self._spool:
+                if record[:1] == Entry._record_type:
+                    if entry is not None:
+                        yield entry
+                    entry = SpooledEntry(record)
+                else:
+                    entry.addenda_records.append(SpooledRecord(record))
+            if entry is not None:
+                yield entry
+            self._spool.seek(0, os.SEEK_END)
+        yield from self._entries
+
+    @property
+    def total_debit_amount(self):
+        return self._spooled_debit + debit_total(self._entries)
+
+    @property
+    def total_credit_amount(self):
+        return self._spooled_credit + credit_total(self._entries)
+
+    @property
+    def entry_count(self):
+        return self._spooled_detail_count + detail_count(self._entries)
+
+    def append(self, entry):
+        self._entries.append(entry)
+        if len(self._entries) > self.max_in_memory:
+            self.spool()
+
+    def spool(self):
+        # The newest entry stays in memory so addenda can still be added to it.
+        spooled, self._entries = self._entries[:-1], self._entries[-1:]
+        if self._spool is None:
+            self._spool = tempfile.TemporaryFile('w+', encoding='utf-8')
+        else:
+            # An iteration that stopped early leaves the file somewhere in the middle.
+            self._spool.seek(0, os.SEEK_END)
+        for entry in spooled:
+            self._spool.write(entry.generate())
+            for addenda in entry.addenda_records:
+                self._spool.write(addenda.generate())
+        self._spooled_count += len(spooled)
+        self._spooled_debit += debit_total(spooled)
+        self._spooled_credit += credit_total(spooled)
+        self._spooled_detail_count += detail_count(spooled)
+
+    def sorted(self, key, max_in_memory=sorting.DEFAULT_MAX_IN_MEMORY):
+        """Returns a new store with these entries in key order, renumbered so trace numbers still ascend."""
+        store = SpooledEntryStore(self.max_in_memory)
+        # The entry numbers are read in a second pass over this store, which only starts once the
+        # sorted runs have been written.
+        entry_numbers = (entry.entry_number for entry in self)
+        for records, entry_number in zip(sorting.sorted_records(self, key, max_in_memory), entry_numbers):
+            entry_record_id = str(entry_number).rjust(7, '0')
+            # The trace number and each addenda's entry record ID end with the entry number.
+            entry, *addenda = [record[:-7] + entry_record_id + '\n' for record in records.splitlines()]
+            spooled_entry = SpooledEntry(entry)
+            spooled_entry.addenda_records.extend(SpooledRecord(record) for record in addenda)
+            store.append(spooled_entry)
+        return store
+
+    def close(self):
+        if self._spool is not None:
+            self._spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BatchTemplate:
+    """Batch settings shared by many batches. The batch header and control records are rendered once,
+    and only the batch number, counts and totals are filled in for each batch.
+
+    Batches made from a template are rendered from the template, not from their own attributes."""
+
+    def __init__(self, company_name, discretionary_data,
+                 company_identification_number,
+                 entry_class_code, entry_description, dfi_number,
+                 service_class=MIXED, description_date=today_with_format,
+                 effective_entry_delay=1):
+        self._batch = BatchHeader(company_name, discretionary_data, company_identification_number,
+                                  entry_class_code, entry_description, dfi_number, '', None,
+                                  service_class, description_date, effective_entry_delay)
+        header = self._batch.generate()
+        self._batch.template = self
+        self._header_prefix = header[:field_lengths.BATCH_HEADER_SLICES['BATCH NUMBER'].start]
+        control = BatchControl(0, 0, decimal.Decimal(0), decimal.Decimal(0), company_identification_number,
+                               dfi_number, '', service_class).generate()
+        control_slices = field_lengths.BATCH_CONTROL_SLICES
+        self._control_prefix = control[:control_slices['DETAIL COUNT'].start]
+        self._control_middle = control[control_slices['COMPANY IDENTIFICATION'].start:
+                                       control_slices['BATCH NUMBER'].start]
+
+    def new_batch(self, batch_number, id_store, spool_after=None):
+        batch = copy.copy(self._batch)
+        batch.batch_number = str(batch_number)
+        batch.entry_records = EntryList() if spool_after is None else SpooledEntryStore(spool_after)
+        batch._id_store = id_store
+        return batch
+
+    def render_header(self, batch_number):
+        return '{0}{1}\n'.format(self._header_prefix,
+                                 validate_field(batch_number, field_lengths.BATCH_HEADER_LENGTHS['BATCH NUMBER'],
+                                                SHIFT_RIGHT_ADD_ZERO))
+
+    def render_control(self, entry_count, entry_hash, total_debit_amount, total_credit_amount, batch_number):
+        return ''.join((self._control_prefix,
+                        validate_field(str(entry_count), field_lengths.BATCH_CONTROL_LENGTHS['DETAIL COUNT'],
+                                       SHIFT_RIGHT_ADD_ZERO),
+                        validate_field(str(entry_hash)[-10:], field_lengths.BATCH_CONTROL_LENGTHS['ENTRY HASH'],
+                                       SHIFT_RIGHT_ADD_ZERO),
+                        validate_field(str(total_debit_amount.quantize(decimal.Decimal('.01'))),
+                                       field_lengths.BATCH_CONTROL_LENGTHS['TOTAL DEBIT AMOUNT'],
+                                       SHIFT_RIGHT_ADD_ZERO, True),
+                        validate_field(str(total_credit_amount.quantize(decimal.Decimal('.01'))),
+                                       field_lengths.BATCH_CONTROL_LENGTHS['TOTAL CREDIT AMOUNT'],
+                                       SHIFT_RIGHT_ADD_ZERO, True),
+                        self._control_middle,
+                        validate_field(str(batch_number), field_lengths.BATCH_CONTROL_LENGTHS['BATCH NUMBER'],
+                                       SHIFT_RIGHT_ADD_ZERO),
+                        '\n'))
 
 
 class BatchControl:
@@ -321,7 +716,7 @@ class BatchControl:
         self.batch_control_record = ''
 
     def generate(self):
-        self.batch_control_record += validate_field(self._record_type,
+        self.batch_control_record = validate_field(self._record_type,
                                                     field_lengths.BATCH_CONTROL_LENGTHS['RECORD TYPE CODE'])
         self.batch_control_record += validate_field(self._service_class,
                                                     field_lengths.BATCH_CONTROL_LENGTHS['SERVICE CLASS CODE'],
@@ -365,25 +760,97 @@ class Entry:
     def __init__(self, transaction_code, routing_number, account_number,
                  amount, identification_number, receiver_name,
                  discretionary_data, originating_dfi_identification, entry_number):
-        self.transaction_code = str(transaction_code)
-        self.routing_number = str(routing_number)
+        self._batch = None  # The batch, or tuple of batches, counting this entry per DFI.
+        self._transaction_code = str(transaction_code)
+        self._routing_number = str(routing_number)
         self._account_number = str(account_number)
-        self.amount = decimal.Decimal(amount)
+        self._amount = decimal.Decimal(amount)
         self._identification_number = str(identification_number)
         self._receiver_name = str(receiver_name)
         self._discretionary_data = str(discretionary_data)
         self._originating_dfi_identification = originating_dfi_identification
         self.entry_record = ''
         self.addenda_records = []
+        self._block_addenda = 0  # Records beyond the first in each of this entry's AddendaBlocks
         self._local_entry_number = entry_number
 
+    @property
+    def account_number(self):
+        return self._account_number
+
+    @property
+    def identification_number(self):
+        return self._identification_number
+
+    @property
+    def receiver_name(self):
+        return self._receiver_name
+
+    @property
+    def discretionary_data(self):
+        return self._discretionary_data
+
     @property
     def has_addenda(self):
         return '1' if self.addenda_records else '0'
 
+    @property
+    def routing_number(self):
+        return self._routing_number
+
+    @routing_number.setter
+    def routing_number(self, routing_number):
+        self._changed()
+        self._routing_number = str(routing_number)
+
+    @property
+    def transaction_code(self):
+        return self._transaction_code
+
+    @transaction_code.setter
+    def transaction_code(self, transaction_code):
+        self._changed()
+        self._transaction_code = transaction_code
+
+    @property
+    def amount(self):
+        return self._amount
+
+    @amount.setter
+    def amount(self, amount):
+        self._changed()
+        self._amount = amount
+
+    def link(self, batch):
+        """Records that batch counts this entry per DFI, so changing the entry makes only that batch count again."""
+        if self._batch is None or self._batch is batch:
+            self._batch = batch
+        elif isinstance(self._batch, tuple):
+            if batch not in self._batch:
+                self._batch += (batch,)
+        else:
+            self._batch = (self._batch, batch)
+
+    def _changed(self):
+        if self._batch is None:
+            return
+        for batch in self._batch if isinstance(self._batch, tuple) else (self._batch,):
+            batch._entry_changes += 1
+
+    @property
+    def entry_number(self):
+        return self._local_entry_number
+
+    @entry_number.setter
+    def entry_number(self, entry_number):
+        self._local_entry_number = entry_number
+        _entry_record_id = str(entry_number).rjust(7, '0')
+        for addenda in self.addenda_records:
+            addenda._entry_record_id = _entry_record_id
+
     @property
     def addenda_count(self):
-        return len(self.addenda_records)
+        return len(self.addenda_records) + self._block_addenda
 
     @property
     def trace_number(self):
@@ -392,7 +859,7 @@ class Entry:
                                str(self._local_entry_number).rjust(entry_padding, '0'))
 
     def generate(self):
-        self.entry_record += validate_field(self._record_type, field_lengths.ENTRY_LENGTHS['RECORD TYPE CODE'])
+        self.entry_record = validate_field(self._record_type, field_lengths.ENTRY_LENGTHS['RECORD TYPE CODE'])
         self.entry_record += validate_field(self.transaction_code, field_lengths.ENTRY_LENGTHS['TRANSACTION CODE'],
                                             SHIFT_LEFT)
         self.entry_record += validate_field(str(self.routing_number), field_lengths.ENTRY_LENGTHS['RECEIVING DFI ID'],
@@ -418,6 +885,16 @@ class Entry:
         _addenda_record = Addenda(main_detail, type_code, _entry_record_id, self.addenda_count + 1)
         self.addenda_records.append(_addenda_record)
 
+    def add_remittance(self, payload, type_code=CTX):
+        # Splits payload into as many MAIN DETAIL fields as it takes, rendered together by one AddendaBlock.
+        _entry_record_id = str(self._local_entry_number).rjust(7, '0')
+        addenda_count = self.addenda_count
+        _addenda_block = AddendaBlock(payload, type_code, _entry_record_id, addenda_count + 1)
+        if addenda_count + _addenda_block.addenda_count > MAX_ADDENDA:
+            raise ValueError('An entry can have at most {0} addenda records'.format(MAX_ADDENDA))
+        self.addenda_records.append(_addenda_block)
+        self._block_addenda += _addenda_block.addenda_count - 1
+
 
 class Addenda:
     _record_type = '7'  # Addenda records are type 7
@@ -430,7 +907,7 @@ class Addenda:
         self.addenda_record = ''
 
     def generate(self):
-        self.addenda_record += validate_field(self._record_type, field_lengths.ADDENDA_LENGTHS['RECORD TYPE'])
+        self.addenda_record = validate_field(self._record_type, field_lengths.ADDENDA_LENGTHS['RECORD TYPE'])
         self.addenda_record += validate_field(self._type_code, field_lengths.ADDENDA_LENGTHS['TYPE CODE'], SHIFT_LEFT)
         self.addenda_record += validate_field(self._main_detail, field_lengths.ADDENDA_LENGTHS['MAIN DETAIL'],
                                               SHIFT_LEFT, to_alphanumeric=False)
@@ -442,6 +919,38 @@ class Addenda:
         return self.addenda_record
 
 
+class AddendaBlock:
+    _record_type = '7'  # Addenda records are type 7
+    _main_detail_length = field_lengths.ADDENDA_LENGTHS['MAIN DETAIL']
+    # EDI payloads are often broken into lines, which would break the fixed width records.
+    _line_breaks = str.maketrans('', '', '\r\n')
+
+    def __init__(self, payload, type_code, entry_record_id, first_sequence):
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            payload = str(payload, 'ascii')
+        self._payload = str(payload).translate(self._line_breaks)
+        self._type_code = str(type_code)
+        self._entry_record_id = str(entry_record_id)
+        self._first_sequence = first_sequence
+        self.addenda_count = max(1, -(-len(self._payload) // self._main_detail_length))
+        self.addenda_record = ''
+
+    def generate(self):
+        # Everything but the main detail and sequence is the same for every record in the block.
+        record_format = '{0}{1}{{0:<{2}}}{{1:0{3}d}}{4}\n'.format(
+            validate_field(self._record_type, field_lengths.ADDENDA_LENGTHS['RECORD TYPE']),
+            validate_field(self._type_code, field_lengths.ADDENDA_LENGTHS['TYPE CODE'], SHIFT_LEFT),
+            self._main_detail_length,
+            field_lengths.ADDENDA_LENGTHS['SEQUENCE'],
+            validate_field(self._entry_record_id, field_lengths.ADDENDA_LENGTHS['ENTRY RECORD ID'], SHIFT_LEFT))
+        payload = self._payload
+        length = self._main_detail_length
+        self.addenda_record = ''.join(
+            record_format.format(payload[start:start + length], sequence)
+            for sequence, start in enumerate(range(0, self.addenda_count * length, length), self._first_sequence))
+        return self.addenda_record
+
+
 class ACHFile(object):
     def __init__(self):
         self._file_header = None
@@ -458,6 +967,9 @@ class ACHFile(object):
         self.origin_id = ''
         self.id_store = IDStore()
         self.company_account_number = ''
+        self.file_id_modifier = 'A'
+        self.creation_date = None
+        self.creation_time = None
         self.file_name = ''
 
     @property
@@ -484,6 +996,23 @@ class ACHFile(object):
     def batch_count(self):
         return len(self.batch_records)
 
+    def close(self):
+        for batch in self.batch_records:
+            batch.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def dfi_breakdown(self):
+        """Returns {DFI prefix: DFITotals} over every batch, e.g. for exposure limits per receiving bank."""
+        breakdown = {}
+        for batch in self.batch_records:
+            batch.dfi_breakdown(breakdown)
+        return dict(sorted(breakdown.items()))
+
     def get_next_batch_number(self):
         return len(self.batch_records) + 1
 
@@ -492,12 +1021,15 @@ class ACHFile(object):
                                        self.origin_id,
                                        self.destination_name,
                                        self.origin_name,
-                                       self.reference_code)
+                                       self.reference_code,
+                                       self.file_id_modifier,
+                                       self.creation_date,
+                                       self.creation_time)
 
     def new_batch(self, dfi_number, batch_name, entry_description=None,
                   company_identification_number=None,
                   entry_class_code=None, discretionary_data='',
-                  service_class=MIXED, effective_entry_delay=1):
+                  service_class=MIXED, effective_entry_delay=1, spool_after=None):
         if entry_description is None:
             entry_description = self.entry_description
         if company_identification_number is None:
@@ -509,11 +1041,43 @@ class ACHFile(object):
                                 entry_class_code, entry_description,
                                 dfi_number, self.get_next_batch_number(), self.id_store,
                                 description_date=self.descriptive_date, service_class=service_class,
-                                effective_entry_delay=effective_entry_delay)
+                                effective_entry_delay=effective_entry_delay, spool_after=spool_after)
         self.batch_records.append(new_batch)
 
-    def save(self, file_path):
+    def batch_template(self, dfi_number, batch_name, entry_description=None,
+                       company_identification_number=None,
+                       entry_class_code=None, discretionary_data='',
+                       service_class=MIXED, effective_entry_delay=1):
+        if entry_description is None:
+            entry_description = self.entry_description
+        if company_identification_number is None:
+            company_identification_number = self.company_identification_number
+        if entry_class_code is None:
+            entry_class_code = self.entry_class_code
+        return BatchTemplate(batch_name, discretionary_data,
+                             company_identification_number,
+                             entry_class_code, entry_description, dfi_number,
+                             description_date=self.descriptive_date, service_class=service_class,
+                             effective_entry_delay=effective_entry_delay)
+
+    def new_batch_from_template(self, template, spool_after=None):
+        self.batch_records.append(template.new_batch(self.get_next_batch_number(), self.id_store, spool_after))
+
+    def save(self, file_path, output_streams=(), sort_key=None, max_in_memory=sorting.DEFAULT_MAX_IN_MEMORY,
+             progress=None, progress_interval=progress_module.DEFAULT_INTERVAL):
+        # progress, when given, is called with a SaveProgress every progress_interval seconds and once at the end.
+        for sample in self.iter_save(file_path, output_streams, sort_key, max_in_memory,
+                                     progress_interval if progress is not None else None):
+            progress(sample)
+
+    def iter_save(self, file_path, output_streams=(), sort_key=None, max_in_memory=sorting.DEFAULT_MAX_IN_MEMORY,
+                  progress_interval=progress_module.DEFAULT_INTERVAL):
+        """Saves the file like save(), yielding a SaveProgress every progress_interval seconds and once at the end.
+
+        Closing the iterator early stops the save and leaves a partial file."""
         for batch in self.batch_records:
+            if sort_key is not None:
+                batch.sort_entries(sort_key, max_in_memory)
             batch.finalize()
         line_count = (self.batch_count * 2) + self.entry_count + 2
         block_count, footer_lines = divmod(line_count, 10)
@@ -528,18 +1092,30 @@ class ACHFile(object):
         except FileExistsError:
             pass  # If the folder exists, don't try to create it.
 
-        with open(file_path, 'w+') as ach_file:
+        sampler = None
+        if progress_interval is not None:
+            sampler = progress_module.ProgressSampler(progress_interval, self.batch_count, self.entry_count,
+                                                      (line_count + footer_lines) * reader.LINE_LENGTH - 1)
+        # Every output stream is fed the same bytes as the file, while they're written.
+        with open(file_path, 'w+') as _file, streams.StreamWriter(_file, output_streams) as ach_file:
             file_header = self._file_header.generate()
             ach_file.write(file_header)
-            for batch in self.batch_records:
-                ach_file.write(batch.generate())
-                for entry in batch.entry_records:
-                    entry_record = entry.generate()
-                    ach_file.write(entry_record)
-                    for addenda in entry.addenda_records:
-                        addenda_record = addenda.generate()
-                        ach_file.write(addenda_record)
-                ach_file.write(batch.batch_control_record)
+            lines, entries = 1, 0
+            for batch_number, batch in enumerate(self.batch_records):
+                if sampler is None:
+                    for record in batch.records():
+                        ach_file.write(record)
+                    continue
+                for record_number, record in enumerate(batch.records(), 1):
+                    ach_file.write(record)
+                    if not record_number % progress_module.SAMPLE_EVERY and sampler.due():
+                        # Remittance addenda render several lines as one record, so this can run a little short.
+                        yield sampler.sample(batch_number, entries + min(record_number - 1, batch.entry_count),
+                                             (lines + record_number) * reader.LINE_LENGTH)
+                lines += batch.entry_count + 2
+                entries += batch.entry_count
+                if sampler.due():
+                    yield sampler.sample(batch_number + 1, entries, lines * reader.LINE_LENGTH)
             file_control_record = self._file_control_record.generate()
             ach_file.write(file_control_record)
 
@@ -548,3 +1124,5 @@ class ACHFile(object):
                 for x in range(0, footer_lines):
                     ach_file.write(line)
         self.file_name = file_path
+        if sampler is not None:
+            yield sampler.sample(self.batch_count, self.entry_count, sampler.total_bytes)
@@ -0,0 +1,272 @@
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+import pyach.ACHRecordTypes as ACHRecordTypes
+import pyach.field_lengths as field_lengths
+import pyach.reader as reader
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# Export formats
+PARQUET = 'parquet'
+ARROW = 'arrow'
+NPZ = 'npz'
+
+# Column types
+INTEGER = 'int'
+STRING = 'str'
+DATE = 'date'
+BOOLEAN = 'bool'
+CATEGORY = 'category'
+
+# Categorical columns are stored as int8 codes into these fixed lists, so every chunk shares one dictionary.
+# Blank or unlisted values are stored as null, or -1 in .npz files.
+TRANSACTION_CODES = ('21', '22', '23', '24', '26', '27', '28', '29',
+                     '31', '32', '33', '34', '36', '37', '38', '39',
+                     '41', '42', '43', '46', '47', '48',
+                     '51', '52', '53', '55', '56')
+SERVICE_CLASS_CODES = (ACHRecordTypes.MIXED, ACHRecordTypes.CREDIT, ACHRecordTypes.DEBIT, '280')
+ENTRY_CLASS_CODES = ('ACK', 'ADV', 'ARC', 'ATX', 'BOC', 'CCD', 'CIE', 'COR', 'CTX', 'DNE', 'ENR', 'IAT',
+                     'MTE', 'POP', 'POS', 'PPD', 'RCK', 'SHR', 'TEL', 'TRC', 'TRX', 'WEB', 'XCK')
+CATEGORIES = {'transaction_code': TRANSACTION_CODES,
+              'service_class': SERVICE_CLASS_CODES,
+              'entry_class_code': ENTRY_CLASS_CODES}
+CATEGORY_CODES = {column: {value: code for code, value in enumerate(values)}
+                  for column, values in CATEGORIES.items()}
+
+BATCH_COLUMNS = (('batch_number', INTEGER),
+                 ('service_class', CATEGORY),
+                 ('company_name', STRING),
+                 ('discretionary_data', STRING),
+                 ('company_identification', STRING),
+                 ('entry_class_code', CATEGORY),
+                 ('entry_description', STRING),
+                 ('descriptive_date', STRING),
+                 ('effective_entry_date', DATE),
+                 ('originating_dfi', STRING),
+                 ('entry_count', INTEGER),
+                 ('entry_hash', INTEGER),
+                 ('total_debit_amount', INTEGER),
+                 ('total_credit_amount', INTEGER))
+ENTRY_COLUMNS = (('batch_number', INTEGER),
+                 ('transaction_code', CATEGORY),
+                 ('routing_number', STRING),
+                 ('account_number', STRING),
+                 ('amount', INTEGER),
+                 ('identification_number', STRING),
+                 ('receiver_name', STRING),
+                 ('discretionary_data', STRING),
+                 ('has_addenda', BOOLEAN),
+                 ('trace_number', STRING))
+ADDENDA_COLUMNS = (('batch_number', INTEGER),
+                   ('trace_number', STRING),
+                   ('type_code', STRING),
+                   ('main_detail', STRING),
+                   ('sequence', INTEGER))
+TABLES = {'batches': BATCH_COLUMNS,
+          'entries': ENTRY_COLUMNS,
+          'addenda': ADDENDA_COLUMNS}
+
+
+def category_code(column, value):
+    return CATEGORY_CODES[column].get(value)
+
+
+class TableChunk:
+    def __init__(self, columns):
+        self.names = [name for name, _ in columns]
+        self.values = [[] for _ in columns]
+
+    def __len__(self):
+        return len(self.values[0])
+
+    def append(self, row):
+        for values, value in zip(self.values, row):
+            values.append(value)
+
+    def flush(self):
+        columns = dict(zip(self.names, self.values))
+        self.values = [[] for _ in self.names]
+        return columns
+
+
+def _source_records(source):
+    if isinstance(source, ACHRecordTypes.ACHFile):
+        for batch in source.batch_records:
+            batch.finalize()
+            for record in batch.records():
+                # An AddendaBlock renders several records at once.
+                yield from record.rstrip('\n').split('\n')
+    else:
+        yield from reader.iter_records(source)
+
+
+def iter_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields (table name, {column: values}) pairs of at most chunk_size rows from an ACHFile or a saved file."""
+    chunks = {name: TableChunk(columns) for name, columns in TABLES.items()}
+    header = field_lengths.BATCH_HEADER_SLICES
+    control = field_lengths.BATCH_CONTROL_SLICES
+    entry = field_lengths.ENTRY_SLICES
+    addenda = field_lengths.ADDENDA_SLICES
+    batch_header = None
+    batch_number = 0
+    trace_number = ''
+    for record in _source_records(source):
+        record_type = record[:1]
+        if record_type == reader.ENTRY:
+            trace_number = record[entry['TRACE NUMBER']]
+            table = 'entries'
+            row = (batch_number,
+                   category_code('transaction_code', record[entry['TRANSACTION CODE']]),
+                   record[entry['RECEIVING DFI ID']].strip(),
+                   record[entry['DFI ACCOUNT NUMBER']].strip(),
+                   int(record[entry['DOLLAR AMOUNT']]),
+                   record[entry['INDIVIDUAL IDENTIFICATION']].strip(),
+                   record[entry['INDIVIDUAL NAME']].strip(),
+                   record[entry['DISCRETIONARY DATA']].strip(),
+                   record[entry['ADDENDA']] == '1',
+                   trace_number)
+        elif record_type == reader.ADDENDA:
+            table = 'addenda'
+            row = (batch_number,
+                   trace_number,
+                   record[addenda['TYPE CODE']],
+                   record[addenda['MAIN DETAIL']].rstrip(),
+                   int(record[addenda['SEQUENCE']]))
+        elif record_type == reader.BATCH_HEADER:
+            batch_header = record
+            batch_number = int(record[header['BATCH NUMBER']])
+            continue
+        elif record_type == reader.BATCH_CONTROL:
+            table = 'batches'
+            row = (batch_number,
+                   category_code('service_class', batch_header[header['SERVICE CLASS CODE']]),
+                   batch_header[header['COMPANY NAME']].strip(),
+                   batch_header[header['DISCRETIONARY DATA']].strip(),
+                   batch_header[header['COMPANY IDENTIFICATION']].strip(),
+                   category_code('entry_class_code', batch_header[header['ENTRY CLASS CODE']]),
+                   batch_header[header['ENTRY DESCRIPTION']].strip(),
+                   batch_header[header['DESCRIPTIVE DATE']].strip(),
+                   reader.parse_date(batch_header[header['EFFECTIVE ENTRY DATE']]),
+                   batch_header[header['ORIGINATING DFI IDENTIFICATION']].strip(),
+                   int(record[control['DETAIL COUNT']]),
+                   int(record[control['ENTRY HASH']]),
+                   int(record[control['TOTAL DEBIT AMOUNT']]),
+                   int(record[control['TOTAL CREDIT AMOUNT']]))
+        else:
+            continue
+        chunk = chunks[table]
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield table, chunk.flush()
+    for table, chunk in chunks.items():
+        if len(chunk):
+            yield table, chunk.flush()
+
+
+def _arrow_schema(columns):
+    types = {INTEGER: pyarrow.int64(),
+             STRING: pyarrow.string(),
+             DATE: pyarrow.date32(),
+             BOOLEAN: pyarrow.bool_(),
+             CATEGORY: pyarrow.dictionary(pyarrow.int8(), pyarrow.string())}
+    return pyarrow.schema([(name, types[column_type]) for name, column_type in columns])
+
+
+def _arrow_table(columns, values, schema):
+    arrays = []
+    for (name, column_type), field in zip(columns, schema):
+        if column_type == CATEGORY:
+            arrays.append(pyarrow.DictionaryArray.from_arrays(pyarrow.array(values[name], pyarrow.int8()),
+                                                              pyarrow.array(CATEGORIES[name])))
+        else:
+            arrays.append(pyarrow.array(values[name], field.type))
+    return pyarrow.Table.from_arrays(arrays, schema=schema)
+
+
+class ParquetTableWriter:
+    extension = '.parquet'
+
+    def __init__(self, path_prefix, table):
+        if pyarrow is None:
+            raise ImportError('pyarrow is required to export {0} files'.format(self.extension))
+        self.columns = TABLES[table]
+        self.schema = _arrow_schema(self.columns)
+        self.paths = ['{0}_{1}{2}'.format(path_prefix, table, self.extension)]
+        self._writer = self._open(self.paths[0])
+
+    def _open(self, path):
+        return pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, values):
+        self._writer.write_table(_arrow_table(self.columns, values, self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class ArrowTableWriter(ParquetTableWriter):
+    extension = '.arrow'
+
+    def _open(self, path):
+        return pyarrow.ipc.new_file(path, self.schema)
+
+
+class NpzTableWriter:
+    def __init__(self, path_prefix, table):
+        if numpy is None:
+            raise ImportError('numpy is required to export .npz files')
+        self.columns = TABLES[table]
+        self._path_format = '{0}_{1}_{{0:05d}}.npz'.format(path_prefix, table)
+        self.paths = []
+
+    def write(self, values):
+        arrays = {}
+        for name, column_type in self.columns:
+            if column_type == CATEGORY:
+                arrays[name] = numpy.array([-1 if code is None else code for code in values[name]], numpy.int8)
+                arrays[name + '_categories'] = numpy.array(CATEGORIES[name])
+            elif column_type == INTEGER:
+                arrays[name] = numpy.array(values[name], numpy.int64)
+            elif column_type == DATE:
+                arrays[name] = numpy.array(values[name], 'datetime64[D]')
+            elif column_type == BOOLEAN:
+                arrays[name] = numpy.array(values[name], numpy.bool_)
+            else:
+                arrays[name] = numpy.array(values[name], str)
+        path = self._path_format.format(len(self.paths))
+        numpy.savez(path, **arrays)
+        self.paths.append(path)
+
+    def close(self):
+        pass
+
+
+WRITERS = {PARQUET: ParquetTableWriter,
+           ARROW: ArrowTableWriter,
+           NPZ: NpzTableWriter}
+
+
+def export(source, path_prefix, file_format=PARQUET, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Writes the batches, entries and addenda tables of source and returns the paths written for each table."""
+    if file_format not in WRITERS:
+        raise ValueError('Unknown export format {0!r}'.format(file_format))
+    writers = {}
+    try:
+        for table in TABLES:
+            writers[table] = WRITERS[file_format](path_prefix, table)
+        for table, values in iter_chunks(source, chunk_size):
+            writers[table].write(values)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {table: writer.paths for table, writer in writers.items()}
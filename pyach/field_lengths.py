@@ -70,3 +70,23 @@ ADDENDA_LENGTHS = {'RECORD TYPE': 1,
                    'SEQUENCE': 4,
                    'ENTRY RECORD ID': 7
                    }
+
+
+def field_slices(lengths, skip=()):
+    slices = {}
+    start = 0
+    for name, length in lengths.items():
+        if name in skip:
+            continue
+        slices[name] = slice(start, start + length)
+        start += length
+    return slices
+
+
+FILE_HEADER_SLICES = field_slices(FILE_HEADER_LENGTHS)
+FILE_CONTROL_SLICES = field_slices(FILE_CONTROL_LENGTHS)
+BATCH_HEADER_SLICES = field_slices(BATCH_HEADER_LENGTHS)
+BATCH_CONTROL_SLICES = field_slices(BATCH_CONTROL_LENGTHS)
+# The check digit is written as the last character of the RECEIVING DFI ID.
+ENTRY_SLICES = field_slices(ENTRY_LENGTHS, skip=('CHECK DIGIT',))
+ADDENDA_SLICES = field_slices(ADDENDA_LENGTHS)
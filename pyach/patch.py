@@ -0,0 +1,141 @@
+import decimal
+import mmap
+
+import pyach.ACHRecordTypes as ACHRecordTypes
+import pyach.field_lengths as field_lengths
+import pyach.reader as reader
+
+# Entry fields that can be patched: (field name, justify mode)
+ENTRY_FIELDS = {'transaction_code': ('TRANSACTION CODE', ACHRecordTypes.SHIFT_LEFT),
+                'routing_number': ('RECEIVING DFI ID', ACHRecordTypes.SHIFT_LEFT),
+                'account_number': ('DFI ACCOUNT NUMBER', ACHRecordTypes.SHIFT_LEFT),
+                'amount': ('DOLLAR AMOUNT', ACHRecordTypes.SHIFT_RIGHT_ADD_ZERO),
+                'identification_number': ('INDIVIDUAL IDENTIFICATION', ACHRecordTypes.SHIFT_LEFT),
+                'receiver_name': ('INDIVIDUAL NAME', ACHRecordTypes.SHIFT_LEFT),
+                'discretionary_data': ('DISCRETIONARY DATA', ACHRecordTypes.SHIFT_LEFT)}
+ENTRY_HASH_MODULUS = 10 ** field_lengths.BATCH_CONTROL_LENGTHS['ENTRY HASH']
+
+
+def render_entry_field(name, value):
+    field, justify = ENTRY_FIELDS[name]
+    length = field_lengths.ENTRY_LENGTHS[field]
+    if name == 'amount':
+        try:
+            value = decimal.Decimal(value).quantize(decimal.Decimal('.01'))
+        except (decimal.InvalidOperation, TypeError, ValueError):
+            raise ValueError('Invalid amount {0!r}'.format(value))
+        if value < 0 or len(str(value)) - 1 > length:
+            raise ValueError('Amount {0} does not fit an entry record'.format(value))
+    return ACHRecordTypes.validate_field(str(value), length, justify)
+
+
+def entry_totals(record):
+    """Returns the (entry hash, debit cents, credit cents) an entry record adds to its batch."""
+    slices = field_lengths.ENTRY_SLICES
+    transaction_code = record[slices['TRANSACTION CODE']]
+    amount = int(record[slices['DOLLAR AMOUNT']])
+    routing_number = record[slices['RECEIVING DFI ID']].strip()
+    entry_hash = int(routing_number[:8]) if routing_number else 0
+    return (entry_hash,
+            amount if transaction_code in ACHRecordTypes.DEBIT_CODES else 0,
+            amount if transaction_code in ACHRecordTypes.CREDIT_CODES else 0)
+
+
+class PatchableFile:
+    """A saved ACH file, memory mapped so single entries can be changed in place.
+
+    Only the changed entry, its batch control and the file control are rewritten."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def __len__(self):
+        return (len(self._map) + 1) // reader.LINE_LENGTH
+
+    def record(self, line_index):
+        offset = line_index * reader.LINE_LENGTH
+        return self._map[offset:offset + reader.RECORD_LENGTH].decode()
+
+    def _write_field(self, line_index, field_slice, value):
+        offset = line_index * reader.LINE_LENGTH
+        self._map[offset + field_slice.start:offset + field_slice.stop] = value.encode()
+
+    def find_entry(self, trace_number):
+        trace_number = str(trace_number).encode()
+        trace_offset = field_lengths.ENTRY_SLICES['TRACE NUMBER'].start
+        position = self._map.find(trace_number)
+        while position != -1:
+            line_index, column = divmod(position, reader.LINE_LENGTH)
+            if column == trace_offset and self._map[line_index * reader.LINE_LENGTH] == ord(reader.ENTRY):
+                return line_index
+            position = self._map.find(trace_number, position + 1)
+        raise KeyError(trace_number.decode())
+
+    def find_batch_control(self, line_index):
+        position = self._map.find(b'\n' + reader.BATCH_CONTROL.encode(), line_index * reader.LINE_LENGTH)
+        if position == -1:
+            raise ValueError('Entry on line {0} has no batch control record'.format(line_index))
+        return (position + 1) // reader.LINE_LENGTH
+
+    def find_file_control(self):
+        line_index = len(self) - 1
+        while self.record(line_index) == reader.PADDING_RECORD:
+            line_index -= 1
+        return line_index
+
+    def _update_totals(self, line_index, slices, entry_hash, debit, credit):
+        record = self.record(line_index)
+        for field, delta, modulus in (('ENTRY HASH', entry_hash, ENTRY_HASH_MODULUS),
+                                      ('TOTAL DEBIT AMOUNT', debit, None),
+                                      ('TOTAL CREDIT AMOUNT', credit, None)):
+            if not delta:
+                continue
+            field_slice = slices[field]
+            value = int(record[field_slice]) + delta
+            if modulus is not None:
+                value %= modulus
+            self._write_field(line_index, field_slice,
+                              str(value).rjust(field_slice.stop - field_slice.start, '0'))
+
+    def patch_entry(self, line_index=None, trace_number=None, **fields):
+        """Sets the given entry fields (see ENTRY_FIELDS) of the entry at line_index or with trace_number."""
+        if line_index is None:
+            line_index = self.find_entry(trace_number)
+        old_record = self.record(line_index)
+        if old_record[:1] != reader.ENTRY:
+            raise ValueError('Line {0} is not an entry record'.format(line_index))
+        unknown_fields = set(fields) - set(ENTRY_FIELDS)
+        if unknown_fields:
+            raise ValueError('Unknown entry fields {0}'.format(sorted(unknown_fields)))
+        # The new record and its totals are worked out before anything is written, so a bad value
+        # can't leave the file half patched.
+        new_record = old_record
+        for name, value in fields.items():
+            field_slice = field_lengths.ENTRY_SLICES[ENTRY_FIELDS[name][0]]
+            new_record = (new_record[:field_slice.start] + render_entry_field(name, value) +
+                          new_record[field_slice.stop:])
+        try:
+            new_totals = entry_totals(new_record)
+        except ValueError:
+            raise ValueError('Patched entry on line {0} has an invalid amount or routing number'.format(line_index))
+        deltas = [new - old for new, old in zip(new_totals, entry_totals(old_record))]
+        self._write_field(line_index, slice(0, reader.RECORD_LENGTH), new_record)
+        if any(deltas):
+            self._update_totals(self.find_batch_control(line_index), field_lengths.BATCH_CONTROL_SLICES, *deltas)
+            self._update_totals(self.find_file_control(), field_lengths.FILE_CONTROL_SLICES, *deltas)
+        return line_index
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
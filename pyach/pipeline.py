@@ -0,0 +1,149 @@
+import collections.abc
+import concurrent.futures
+import decimal
+import os
+import string
+import time
+
+import pyach.ACHRecordTypes as ACHRecordTypes
+
+FILE_ID_MODIFIERS = string.ascii_uppercase + string.digits
+
+
+class BatchSpec:
+    def __init__(self, dfi_number, batch_name, entries, **options):
+        # entries is an iterable of add_entry arguments (tuples or dicts), or a picklable callable returning one.
+        self.dfi_number = dfi_number
+        self.batch_name = batch_name
+        self.entries = entries
+        self.options = options  # Passed through to ACHFile.new_batch
+
+
+class FileSpec:
+    def __init__(self, file_path, batches, file_id_modifier=None, **attributes):
+        self.file_path = file_path
+        self.batches = batches
+        self.file_id_modifier = file_id_modifier
+        self.attributes = attributes  # ACHFile attributes, e.g. destination_routing_number, origin_id
+
+
+class Manifest:
+    def __init__(self, files, seconds):
+        self.files = files
+        self.seconds = seconds
+
+    @property
+    def entry_count(self):
+        return sum(file['entry_count'] for file in self.files)
+
+    @property
+    def total_debit_amount(self):
+        return sum((file['total_debit_amount'] for file in self.files), decimal.Decimal(0))
+
+    @property
+    def total_credit_amount(self):
+        return sum((file['total_credit_amount'] for file in self.files), decimal.Decimal(0))
+
+
+def build_file(spec, creation_date, creation_time, file_id_modifier=None):
+    start = time.perf_counter()
+    if file_id_modifier is None:
+        file_id_modifier = spec.file_id_modifier
+    ach_file = ACHRecordTypes.ACHFile()
+    for name, value in spec.attributes.items():
+        setattr(ach_file, name, value)
+    ach_file.file_id_modifier = file_id_modifier
+    ach_file.creation_date = creation_date
+    ach_file.creation_time = creation_time
+    ach_file.create_header()
+    for batch_spec in spec.batches:
+        ach_file.new_batch(batch_spec.dfi_number, batch_spec.batch_name, **batch_spec.options)
+        batch = ach_file.batch_records[-1]
+        entries = batch_spec.entries() if callable(batch_spec.entries) else batch_spec.entries
+        for entry in entries:
+            if isinstance(entry, dict):
+                batch.add_entry(**entry)
+            else:
+                batch.add_entry(*entry)
+    ach_file.save(spec.file_path)
+    return {'file_path': spec.file_path,
+            'file_id_modifier': file_id_modifier,
+            'batch_count': ach_file.batch_count,
+            'entry_count': ach_file.entry_count,
+            'entry_hash': ach_file.entry_hash,
+            'total_debit_amount': decimal.Decimal(ach_file.total_debit_amount),
+            'total_credit_amount': decimal.Decimal(ach_file.total_credit_amount),
+            'seconds': time.perf_counter() - start}
+
+
+def assign_file_id_modifiers(specs):
+    """Yields (spec, file ID modifier) pairs. Files without a modifier of their own get the first letter
+    not yet taken for their destination, in the order they were given.
+
+    A sequence of specs is checked for repeated modifiers before anything is yielded. Lazily read specs
+    can't mix given and assigned modifiers for one destination, since a later spec could ask for a letter
+    that's already been assigned."""
+    reserved = {}
+    is_sequence = isinstance(specs, collections.abc.Sequence)
+    if is_sequence:
+        for spec in specs:
+            if spec.file_id_modifier is not None:
+                _take(reserved, spec)
+    used = {}
+    assigned = set()  # Destinations given assigned modifiers
+    for spec in specs:
+        destination = spec.attributes.get('destination_routing_number', '')
+        if spec.file_id_modifier is None:
+            taken = used.setdefault(destination, set()) | reserved.get(destination, set())
+            free = [modifier for modifier in FILE_ID_MODIFIERS if modifier not in taken]
+            if not free:
+                raise ValueError('Too many files for destination {0}'.format(destination))
+            modifier = free[0]
+            assigned.add(destination)
+        elif is_sequence:
+            modifier = spec.file_id_modifier
+        elif destination in assigned:
+            raise ValueError("Specs read lazily can't mix given and assigned file ID modifiers for "
+                             "destination {0}".format(destination))
+        else:
+            modifier = _take(reserved, spec)
+        used.setdefault(destination, set()).add(modifier)
+        yield spec, modifier
+
+
+def _take(reserved, spec):
+    destination = spec.attributes.get('destination_routing_number', '')
+    taken = reserved.setdefault(destination, set())
+    if spec.file_id_modifier in taken:
+        raise ValueError('File ID modifier {0} is used twice for destination {1}'.format(spec.file_id_modifier,
+                                                                                      destination))
+    taken.add(spec.file_id_modifier)
+    return spec.file_id_modifier
+
+
+def run(specs, max_workers=None, max_pending=None):
+    """Builds and saves every FileSpec in a process pool and returns a Manifest in spec order.
+
+    specs is consumed lazily; no more than max_pending files are queued at once."""
+    start = time.perf_counter()
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = max_workers * 2
+    creation_date = ACHRecordTypes.today_with_format
+    creation_time = ACHRecordTypes.now_with_format
+    results = {}
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            results[pending.pop(future)] = future.result()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        for index, (spec, file_id_modifier) in enumerate(assign_file_id_modifiers(specs)):
+            if len(pending) >= max_pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(build_file, spec, creation_date, creation_time, file_id_modifier)] = index
+        collect(list(pending))
+    return Manifest([results[index] for index in sorted(results)], time.perf_counter() - start)
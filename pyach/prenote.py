@@ -0,0 +1,126 @@
+import dbm
+
+import pyach.ACHRecordTypes as ACHRecordTypes
+
+# Live transaction codes and the prenote code for the same account type and direction.
+PRENOTE_TRANSACTION_CODES = {ACHRecordTypes.CHECK_DEPOSIT: ACHRecordTypes.PRE_CHECK_CREDIT,
+                             ACHRecordTypes.PRE_CHECK_CREDIT: ACHRecordTypes.PRE_CHECK_CREDIT,
+                             ACHRecordTypes.CHECK_DEBIT: ACHRecordTypes.PRE_CHECK_DEBIT,
+                             ACHRecordTypes.PRE_CHECK_DEBIT: ACHRecordTypes.PRE_CHECK_DEBIT,
+                             ACHRecordTypes.SAVINGS_DEPOSIT: ACHRecordTypes.PRE_SAVINGS_CREDIT,
+                             ACHRecordTypes.PRE_SAVINGS_CREDIT: ACHRecordTypes.PRE_SAVINGS_CREDIT,
+                             ACHRecordTypes.SAVINGS_DEBIT: ACHRecordTypes.PRE_SAVINGS_DEBIT,
+                             ACHRecordTypes.PRE_SAVINGS_DEBIT: ACHRecordTypes.PRE_SAVINGS_DEBIT}
+
+FILE_ATTRIBUTES = ('destination_routing_number', 'origin_id', 'destination_name', 'origin_name', 'reference_code',
+                   'entry_class_code', 'entry_description', 'descriptive_date', 'company_identification_number')
+
+
+class PrenoteRegistry:
+    """The set of accounts that have been prenoted. It's kept in a dbm file when given a path.
+
+    Accounts added are pending until commit() is called, once the prenote file has been saved."""
+
+    def __init__(self, path=None):
+        self._accounts = set() if path is None else dbm.open(path, 'c')
+        self.pending = set()
+
+    @staticmethod
+    def key(transaction_code, routing_number, account_number):
+        return '{0}:{1}:{2}'.format(transaction_code, routing_number, account_number)
+
+    def __contains__(self, key):
+        return key in self.pending or key in self._accounts
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def add(self, key):
+        self.pending.add(key)
+
+    def commit(self, keys=None):
+        """Records keys, or every pending account, as prenoted."""
+        keys = set(self.pending if keys is None else keys)
+        for key in keys:
+            if isinstance(self._accounts, set):
+                self._accounts.add(key)
+            else:
+                self._accounts[key] = b''
+        self.pending -= keys
+
+    def rollback(self):
+        self.pending.clear()
+
+    def close(self):
+        if not isinstance(self._accounts, set):
+            self._accounts.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def entry_accounts(entries):
+    for entry in entries:
+        yield (entry.transaction_code, entry.routing_number, entry.account_number,
+               entry.identification_number, entry.receiver_name, entry.discretionary_data)
+
+
+def prenote_entries(accounts, registry=None):
+    """Yields zero dollar add_entry arguments for each account that hasn't been prenoted yet.
+
+    accounts are (transaction_code, routing_number, account_number, identification_number, receiver_name,
+    discretionary_data) tuples. Accounts are added to registry as pending as they're yielded."""
+    if registry is None:
+        registry = PrenoteRegistry()
+    prenote_codes = PRENOTE_TRANSACTION_CODES
+    key = PrenoteRegistry.key
+    for transaction_code, routing_number, account_number, identification_number, receiver_name, \
+            discretionary_data in accounts:
+        try:
+            prenote_code = prenote_codes[str(transaction_code)]
+        except KeyError:
+            raise ValueError('Transaction code {0} has no prenote code'.format(transaction_code))
+        account_key = key(prenote_code, routing_number, account_number)
+        if account_key in registry:
+            continue
+        registry.add(account_key)
+        yield (prenote_code, routing_number, account_number, 0, identification_number, receiver_name,
+               discretionary_data)
+
+
+def prenote_batch(ach_file, batch, registry=None, spool_after=None):
+    """Adds a batch of prenotes for batch's accounts to ach_file, unless they've all been prenoted.
+
+    spool_after is passed to new_batch, so very long prenote batches can be spooled to disk."""
+    entries = prenote_entries(entry_accounts(batch.entry_records), registry)
+    first_entry = next(entries, None)
+    if first_entry is None:
+        return None
+    ach_file.new_batch(batch.originator_dfi_identification, batch.company_name,
+                       entry_description=batch.entry_description,
+                       company_identification_number=batch.company_identification_number,
+                       entry_class_code=batch.entry_class_code,
+                       discretionary_data=batch.discretionary_data,
+                       service_class=batch.service_class,
+                       spool_after=spool_after)
+    prenotes = ach_file.batch_records[-1]
+    prenotes.add_entry(*first_entry)
+    for entry in entries:
+        prenotes.add_entry(*entry)
+    return prenotes
+
+
+def prenote_file(source_file, registry=None, spool_after=None):
+    """Returns a new ACHFile with a prenote for every account in source_file that hasn't been prenoted."""
+    if registry is None:
+        registry = PrenoteRegistry()
+    ach_file = ACHRecordTypes.ACHFile()
+    for name in FILE_ATTRIBUTES:
+        setattr(ach_file, name, getattr(source_file, name))
+    ach_file.create_header()
+    for batch in source_file.batch_records:
+        prenote_batch(ach_file, batch, registry, spool_after)
+    return ach_file
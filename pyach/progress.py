@@ -0,0 +1,73 @@
+import collections
+import os
+import time
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+DEFAULT_INTERVAL = 1.0
+# Records written inside one batch between looks at the clock, so huge batches still report.
+SAMPLE_EVERY = 4096
+
+
+def rss_bytes():
+    """Returns the resident set size of this process, or its peak where the current size can't be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        # ru_maxrss is in kilobytes, except on macOS where it's bytes.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    return None
+
+
+class SaveProgress(collections.namedtuple('SaveProgress', 'batches batch_count entries entry_count bytes_written '
+                                                          'total_bytes rss elapsed eta')):
+    @property
+    def fraction(self):
+        return self.bytes_written / self.total_bytes if self.total_bytes else 1.0
+
+    @property
+    def done(self):
+        return self.bytes_written >= self.total_bytes
+
+
+class ProgressSampler:
+    """Decides when a save reports its progress. Only due() is called while records are being written."""
+
+    def __init__(self, interval, batch_count, entry_count, total_bytes):
+        self.interval = interval
+        self.batch_count = batch_count
+        self.entry_count = entry_count
+        self.total_bytes = total_bytes
+        self.start = time.monotonic()
+        self._next = self.start + interval
+
+    def due(self):
+        return time.monotonic() >= self._next
+
+    def sample(self, batches, entries, bytes_written):
+        now = time.monotonic()
+        self._next = now + self.interval
+        elapsed = now - self.start
+        bytes_written = min(bytes_written, self.total_bytes)
+        if bytes_written >= self.total_bytes:
+            eta = 0.0
+        elif bytes_written:
+            eta = elapsed * (self.total_bytes - bytes_written) / bytes_written
+        else:
+            eta = None
+        return SaveProgress(batches, self.batch_count, entries, self.entry_count, bytes_written, self.total_bytes,
+                            rss_bytes(), elapsed, eta)
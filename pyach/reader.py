@@ -0,0 +1,31 @@
+import datetime
+
+RECORD_LENGTH = 94
+LINE_LENGTH = RECORD_LENGTH + 1  # Every record is followed by a newline.
+
+# Record type codes
+FILE_HEADER = '1'
+BATCH_HEADER = '5'
+ENTRY = '6'
+ADDENDA = '7'
+BATCH_CONTROL = '8'
+FILE_CONTROL = '9'
+
+# Blocks are filled out to a multiple of ten lines with records of all nines.
+PADDING_RECORD = '9' * RECORD_LENGTH
+
+
+def parse_date(value):
+    # Dates are written as YYMMDD.
+    if not value.strip():
+        return None
+    return datetime.date(2000 + int(value[:2]), int(value[2:4]), int(value[4:6]))
+
+
+def iter_records(file_path):
+    with open(file_path) as ach_file:
+        for line in ach_file:
+            record = line.rstrip('\n')
+            if not record or record == PADDING_RECORD:
+                continue
+            yield record
@@ -0,0 +1,140 @@
+import collections
+import datetime
+import decimal
+
+import pyach.ACHRecordTypes as ACHRecordTypes
+import pyach.field_lengths as field_lengths
+import pyach.reader as reader
+
+# Amounts are integer cents and effective dates are datetime.dates, so both sides compare exactly.
+Record = collections.namedtuple('Record', 'trace_number amount routing_number account_number effective_date')
+Record.__new__.__defaults__ = (None, None, None)
+
+DEFAULT_KEY = ('trace_number',)
+COMPARED_FIELDS = ('routing_number', 'account_number', 'effective_date')
+
+
+def to_cents(amount):
+    return int(decimal.Decimal(str(amount)).quantize(decimal.Decimal('.01')).scaleb(2))
+
+
+def to_date(value, date_format=None):
+    # Strings are parsed with date_format when it's given, and otherwise as ISO dates or YYMMDD as in ACH files.
+    if value is None or isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    value = str(value).strip()
+    if not value:
+        return None
+    if date_format is not None:
+        return datetime.datetime.strptime(value, date_format).date()
+    if '-' in value:
+        return datetime.date.fromisoformat(value[:10])
+    return reader.parse_date(value)
+
+
+def _entry_field(value, field):
+    # Normalised the way Entry.generate() writes it, so objects and saved files give the same Records.
+    return ACHRecordTypes.validate_field(str(value), field_lengths.ENTRY_LENGTHS[field]).strip()
+
+
+def batch_records(batch):
+    effective_date = reader.parse_date(batch.effective_entry_date)
+    for entry in batch.entry_records:
+        yield Record(entry.trace_number, to_cents(entry.amount),
+                     _entry_field(entry.routing_number, 'RECEIVING DFI ID'),
+                     _entry_field(entry.account_number, 'DFI ACCOUNT NUMBER'), effective_date)
+
+
+def file_records(file_path):
+    header = field_lengths.BATCH_HEADER_SLICES
+    entry = field_lengths.ENTRY_SLICES
+    effective_date = None
+    for record in reader.iter_records(file_path):
+        record_type = record[:1]
+        if record_type == reader.ENTRY:
+            yield Record(record[entry['TRACE NUMBER']], int(record[entry['DOLLAR AMOUNT']]),
+                         record[entry['RECEIVING DFI ID']].strip(), record[entry['DFI ACCOUNT NUMBER']].strip(),
+                         effective_date)
+        elif record_type == reader.BATCH_HEADER:
+            effective_date = reader.parse_date(record[header['EFFECTIVE ENTRY DATE']])
+
+
+def ach_records(source):
+    """Yields a Record for every entry in an ACHFile, a BatchHeader or a saved file."""
+    if isinstance(source, ACHRecordTypes.ACHFile):
+        for batch in source.batch_records:
+            yield from batch_records(batch)
+    elif isinstance(source, ACHRecordTypes.BatchHeader):
+        yield from batch_records(source)
+    else:
+        yield from file_records(source)
+
+
+def mapping_records(rows, date_format=None):
+    """Yields a Record for each mapping in rows, e.g. csv.DictReader rows of a settlement report.
+
+    Amounts are in dollars and dates are read by to_date with date_format. Missing fields aren't compared."""
+    for row in rows:
+        yield Record(str(row['trace_number']), to_cents(row['amount']), row.get('routing_number'),
+                     row.get('account_number'), to_date(row.get('effective_date'), date_format))
+
+
+class ReconciliationReport:
+    def __init__(self):
+        self.matched = []  # (ach record, other record) pairs that agree
+        self.amount_mismatches = []  # (ach record, other record) pairs with different amounts
+        self.field_mismatches = []  # (ach record, other record, field names) with other differences
+        self.unmatched_ach = []
+        self.unmatched_other = []
+
+    @property
+    def is_reconciled(self):
+        return not (self.amount_mismatches or self.field_mismatches or self.unmatched_ach or self.unmatched_other)
+
+
+def _size(records):
+    try:
+        return len(records)
+    except TypeError:
+        return None
+
+
+def reconcile(ach, other, key=DEFAULT_KEY):
+    """Matches the entries of ach (anything ach_records accepts, or Records) against other's Records on key.
+
+    The smaller side, when it can be told, is indexed by key and the other side is streamed past it."""
+    if not isinstance(ach, (list, tuple)):
+        ach = ach_records(ach)
+    ach_size, other_size = _size(ach), _size(other)
+    index_ach = ach_size is not None and (other_size is None or ach_size < other_size)
+    indexed, streamed = (ach, other) if index_ach else (other, ach)
+
+    key_fields = [Record._fields.index(name) for name in key]
+    index = {}
+    for record in indexed:
+        index.setdefault(tuple(record[field] for field in key_fields), collections.deque()).append(record)
+
+    report = ReconciliationReport()
+    unmatched_streamed = report.unmatched_other if index_ach else report.unmatched_ach
+    for record in streamed:
+        matches = index.get(tuple(record[field] for field in key_fields))
+        if not matches:
+            unmatched_streamed.append(record)
+            continue
+        match = matches.popleft()
+        ach_record, other_record = (match, record) if index_ach else (record, match)
+        if ach_record.amount != other_record.amount:
+            report.amount_mismatches.append((ach_record, other_record))
+            continue
+        fields = [name for name in COMPARED_FIELDS
+                  if getattr(other_record, name) not in (None, getattr(ach_record, name))]
+        if fields:
+            report.field_mismatches.append((ach_record, other_record, fields))
+        else:
+            report.matched.append((ach_record, other_record))
+    unmatched_indexed = report.unmatched_ach if index_ach else report.unmatched_other
+    for matches in index.values():
+        unmatched_indexed.extend(matches)
+    return report
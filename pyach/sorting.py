@@ -0,0 +1,106 @@
+import decimal
+import heapq
+import struct
+import tempfile
+
+DEFAULT_MAX_IN_MEMORY = 1000000
+READ_RECORDS = 4096
+
+
+# Sort keys turn an entry into a small tuple of integers.
+def routing_number(entry):
+    return int(entry.routing_number),
+
+
+def amount(entry):
+    return int(entry.amount.quantize(decimal.Decimal('.01')).scaleb(2)),
+
+
+def routing_number_and_amount(entry):
+    return routing_number(entry) + amount(entry)
+
+
+def _spill(run):
+    record_struct = struct.Struct('>{0}q'.format(len(run[0])))
+    run_file = tempfile.TemporaryFile()
+    for item in run:
+        run_file.write(record_struct.pack(*item))
+    run_file.seek(0)
+    return _read_run(run_file, record_struct)
+
+
+def _read_run(run_file, record_struct):
+    with run_file:
+        while True:
+            data = run_file.read(record_struct.size * READ_RECORDS)
+            if not data:
+                break
+            yield from record_struct.iter_unpack(data)
+
+
+def sort_order(entries, key, max_in_memory=DEFAULT_MAX_IN_MEMORY):
+    """Yields the indexes of entries in key order, ties kept in their original order.
+
+    Only the keys are sorted. Once more than max_in_memory keys have been collected they're written to a
+    temporary file as a sorted run, and the runs are merged at the end."""
+    runs = []
+    run = []
+    for index, entry in enumerate(entries):
+        run.append(key(entry) + (index,))
+        if len(run) >= max_in_memory:
+            run.sort()
+            runs.append(_spill(run))
+            run = []
+    run.sort()
+    if runs:
+        run = heapq.merge(*runs, iter(run))
+    for item in run:
+        yield item[-1]
+
+
+def _rendered(entry):
+    return entry.generate() + ''.join(addenda.generate() for addenda in entry.addenda_records)
+
+
+def _spill_records(run, key_length):
+    header_struct = struct.Struct('>{0}qI'.format(key_length + 1))
+    run_file = tempfile.TemporaryFile()
+    for item, records in run:
+        data = records.encode()
+        run_file.write(header_struct.pack(*item, len(data)))
+        run_file.write(data)
+    run_file.seek(0)
+    return _read_record_run(run_file, header_struct)
+
+
+def _read_record_run(run_file, header_struct):
+    with run_file:
+        while True:
+            header = run_file.read(header_struct.size)
+            if not header:
+                break
+            *item, length = header_struct.unpack(header)
+            yield tuple(item), run_file.read(length).decode()
+
+
+def sorted_records(entries, key, max_in_memory=DEFAULT_MAX_IN_MEMORY):
+    """Yields the rendered records (the entry and its addenda) of entries in key order, ties kept in order.
+
+    Like sort_order, but the records are written to the sorted runs with their keys, so the entries
+    themselves never have to be held in memory together."""
+    runs = []
+    run = []
+    key_length = None
+    for index, entry in enumerate(entries):
+        item = key(entry) + (index,)
+        key_length = len(item) - 1
+        run.append((item, _rendered(entry)))
+        if len(run) >= max_in_memory:
+            run.sort(key=lambda pair: pair[0])
+            runs.append(_spill_records(run, key_length))
+            run = []
+    run.sort(key=lambda pair: pair[0])
+    if runs:
+        run = heapq.merge(*runs, iter(run), key=lambda pair: pair[0])
+    for _, records in run:
+        yield records
@@ -0,0 +1,101 @@
+import gzip
+import hashlib
+import os
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+BUFFER_SIZE = 1 << 16
+
+
+class HashStream:
+    def __init__(self, algorithm='sha256'):
+        self.algorithm = algorithm
+        self._hash = hashlib.new(algorithm)
+
+    @property
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def write(self, data):
+        self._hash.update(data)
+
+    def close(self):
+        pass
+
+
+class GzipStream:
+    def __init__(self, path, compresslevel=9):
+        self.path = path
+        self._file = gzip.open(path, 'wb', compresslevel)
+
+    def write(self, data):
+        self._file.write(data)
+
+    def close(self):
+        self._file.close()
+
+
+class ZstdStream:
+    def __init__(self, path, level=3):
+        if zstandard is None:
+            raise ImportError('zstandard is required to write .zst files')
+        self.path = path
+        self._file = zstandard.ZstdCompressor(level=level).stream_writer(open(path, 'wb'))
+
+    def write(self, data):
+        self._file.write(data)
+
+    def close(self):
+        self._file.close()
+
+
+class StreamWriter:
+    """Writes text to file and the same encoded bytes to every stream, in BUFFER_SIZE pieces.
+
+    newline is what file turns each '\\n' into, os.linesep for files opened in text mode with the default
+    newline, so the streams see the bytes that end up on disk."""
+
+    def __init__(self, file, streams=(), encoding=None, newline=os.linesep):
+        self._file = file
+        self._streams = list(streams)
+        self._encoding = encoding or getattr(file, 'encoding', None) or 'utf-8'
+        self._newline = newline
+        self._buffer = []
+        self._buffered = 0
+        if not self._streams:
+            self.write = file.write
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        text = ''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        self._file.write(text)
+        if self._newline != '\n':
+            text = text.replace('\n', self._newline)
+        data = text.encode(self._encoding)
+        for stream in self._streams:
+            stream.write(data)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            for stream in self._streams:
+                stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
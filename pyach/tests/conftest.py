@@ -0,0 +1,62 @@
+import datetime
+
+import pytest
+
+import pyach.ACHRecordTypes
+from pyach.tests.test_ACHFile import (ACCOUNT_NUMBER, AMOUNTS, BATCH_NAME, COMPANY_IDENTIFICATION_NUMBER,
+                                      DESTINATION_NAME, DESTINATION_ROUTING_NUMBER, DFI_NUMBER, DISCRETIONARY_DATA,
+                                      ENTRY_CLASS_CODE, ENTRY_DESCRIPTION, FakeDate,
+                                      INDIVIDUAL_IDENTIFICATION_NUMBER, NOW, ORIGIN_NAME, ORIGIN_ROUTING_NUMBER,
+                                      RECEIVER_NAME, REFERENCE_CODE, TODAY)
+
+SECOND_ROUTING_NUMBER = '021000021'
+
+
+@pytest.fixture
+def fixed_dates(monkeypatch):
+    monkeypatch.setattr(pyach.ACHRecordTypes, 'today_with_format', TODAY)
+    monkeypatch.setattr(pyach.ACHRecordTypes, 'now_with_format', NOW)
+    monkeypatch.setattr(datetime, 'datetime', FakeDate)
+
+
+@pytest.fixture
+def populated_ach_file(fixed_dates):
+    ach_file = pyach.ACHRecordTypes.ACHFile()
+    ach_file.destination_name = DESTINATION_NAME
+    ach_file.destination_routing_number = DESTINATION_ROUTING_NUMBER
+    ach_file.entry_class_code = ENTRY_CLASS_CODE
+    ach_file.entry_description = ENTRY_DESCRIPTION
+    ach_file.origin_name = ORIGIN_NAME
+    ach_file.reference_code = REFERENCE_CODE
+    ach_file.origin_routing_number = ORIGIN_ROUTING_NUMBER
+    ach_file.origin_id = COMPANY_IDENTIFICATION_NUMBER
+    ach_file.company_identification_number = COMPANY_IDENTIFICATION_NUMBER
+    ach_file.create_header()
+    for routing_number in (DESTINATION_ROUTING_NUMBER, SECOND_ROUTING_NUMBER):
+        ach_file.new_batch(DFI_NUMBER, BATCH_NAME, discretionary_data=DISCRETIONARY_DATA)
+        for amount in AMOUNTS:
+            ach_file.batch_records[-1].add_entry(pyach.ACHRecordTypes.CHECK_DEPOSIT, routing_number,
+                                                 ACCOUNT_NUMBER, amount, INDIVIDUAL_IDENTIFICATION_NUMBER,
+                                                 RECEIVER_NAME)
+            ach_file.batch_records[-1].entry_records[-1].add_addenda('test', pyach.ACHRecordTypes.CCD)
+            ach_file.batch_records[-1].add_entry(pyach.ACHRecordTypes.CHECK_DEBIT, routing_number,
+                                                 ACCOUNT_NUMBER, amount, INDIVIDUAL_IDENTIFICATION_NUMBER,
+                                                 RECEIVER_NAME)
+    return ach_file
+
+
+# Records rendered and seconds taken by each engine in the differential tests.
+THROUGHPUT = {}
+
+
+def pytest_terminal_summary(terminalreporter):
+    rates = {engine: records / seconds for engine, (records, seconds) in THROUGHPUT.items() if seconds}
+    if not rates:
+        return
+    terminalreporter.section('ACH engine throughput')
+    for engine in sorted(rates):
+        records, seconds = THROUGHPUT[engine]
+        line = '{0:<20} {1:>8} records {2:>8.3f}s {3:>10.0f} records/s'.format(engine, records, seconds, rates[engine])
+        if 'reference' in rates:
+            line += ' ({0:.2f}x reference)'.format(rates[engine] / rates['reference'])
+        terminalreporter.write_line(line)
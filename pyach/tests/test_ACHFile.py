@@ -132,6 +132,44 @@ class TestACHRecord:
         eq(test_addenda[87:94], '0000001')
         eq(test_entry[78], '1')
 
+    def test_entry_record_with_remittance(self, ach_file):
+        ach_file.batch_records[-1].add_entry(pyach.ACHRecordTypes.CHECK_DEPOSIT, DESTINATION_ROUTING_NUMBER,
+                                             ACCOUNT_NUMBER, AMOUNT, COMPANY_IDENTIFICATION_NUMBER,
+                                             RECEIVER_NAME, DISCRETIONARY_DATA)
+        entry_record = ach_file.batch_records[-1].entry_records[-1]
+        entry_record.add_addenda('test', pyach.ACHRecordTypes.CCD)
+        entry_record.add_remittance(b'ISA*00*' + b'x' * 200)
+        eq(entry_record.addenda_count, 4)
+        eq(ach_file.batch_records[-1].entry_count, 5)
+        test_addenda = entry_record.addenda_records[-1].generate().split('\n')
+        eq(test_addenda[-1], '')
+        eq(len(test_addenda), 4)
+        eq(test_addenda[0][:10], '705ISA*00*')
+        eq(test_addenda[2][3:83].strip(), 'x' * 47)
+        eq([addenda[83:87] for addenda in test_addenda[:3]], ['0002', '0003', '0004'])
+        eq(test_addenda[0][87:94], '0000001')
+        with pytest.raises(ValueError):
+            entry_record.add_remittance('x' * 80 * pyach.ACHRecordTypes.MAX_ADDENDA)
+
+    def test_remittance_line_breaks_are_removed(self, ach_file):
+        ach_file.batch_records[-1].add_entry(pyach.ACHRecordTypes.CHECK_DEPOSIT, DESTINATION_ROUTING_NUMBER,
+                                             ACCOUNT_NUMBER, AMOUNT, COMPANY_IDENTIFICATION_NUMBER,
+                                             RECEIVER_NAME, DISCRETIONARY_DATA)
+        entry_record = ach_file.batch_records[-1].entry_records[-1]
+        entry_record.add_remittance('ISA*00*~\r\nGS*RA~\n' + 'x' * 70)
+        test_addenda = entry_record.addenda_records[-1].generate().split('\n')
+        eq([len(addenda) for addenda in test_addenda], [94, 94, 0])
+        eq(test_addenda[0][3:83], 'ISA*00*~GS*RA~' + 'x' * 66)
+
+    def test_addenda_count_follows_addenda_records(self, ach_file):
+        ach_file.batch_records[-1].add_entry(pyach.ACHRecordTypes.CHECK_DEPOSIT, DESTINATION_ROUTING_NUMBER,
+                                             ACCOUNT_NUMBER, AMOUNT, COMPANY_IDENTIFICATION_NUMBER,
+                                             RECEIVER_NAME, DISCRETIONARY_DATA)
+        entry_record = ach_file.batch_records[-1].entry_records[-1]
+        entry_record.addenda_records.append(pyach.ACHRecordTypes.Addenda('test', pyach.ACHRecordTypes.CCD,
+                                                                         '0000001', 1))
+        eq((entry_record.addenda_count, ach_file.batch_records[-1].entry_count), (1, 2))
+
 
 class TestAchSave:
     @pytest.fixture
@@ -304,6 +342,47 @@ class TestAchSave:
         assert save_ach_file.has_payments
 
 
+class TestBatchTemplate:
+    @pytest.fixture
+    def ach_files(self, monkeypatch):
+        monkeypatch.setattr(pyach.ACHRecordTypes, 'today_with_format', TODAY)
+        monkeypatch.setattr(datetime, 'datetime', FakeDate)
+        ach_files = pyach.ACHRecordTypes.ACHFile(), pyach.ACHRecordTypes.ACHFile()
+        for ach_file in ach_files:
+            ach_file.entry_class_code = ENTRY_CLASS_CODE
+            ach_file.entry_description = ENTRY_DESCRIPTION
+            ach_file.company_identification_number = COMPANY_IDENTIFICATION_NUMBER
+        return ach_files
+
+    def test_matches_new_batch(self, ach_files):
+        ach_file, template_file = ach_files
+        template = template_file.batch_template(DFI_NUMBER, BATCH_NAME, discretionary_data=DISCRETIONARY_DATA,
+                                                service_class=pyach.ACHRecordTypes.DEBIT)
+        for amount in AMOUNTS:
+            ach_file.new_batch(DFI_NUMBER, BATCH_NAME, discretionary_data=DISCRETIONARY_DATA,
+                               service_class=pyach.ACHRecordTypes.DEBIT)
+            template_file.new_batch_from_template(template)
+            for batch in ach_file.batch_records[-1], template_file.batch_records[-1]:
+                batch.add_entry(pyach.ACHRecordTypes.CHECK_DEBIT, DESTINATION_ROUTING_NUMBER, ACCOUNT_NUMBER,
+                                amount, INDIVIDUAL_IDENTIFICATION_NUMBER, RECEIVER_NAME)
+        for batch, template_batch in zip(ach_file.batch_records, template_file.batch_records):
+            batch.finalize()
+            template_batch.finalize()
+            eq(list(template_batch.records()), list(batch.records()))
+        eq(template_file.batch_records[-1].generate()[87:94], '0000005')
+        eq(template_file.entry_hash, ach_file.entry_hash)
+
+    def test_many_batches(self, ach_files):
+        template_file = ach_files[1]
+        template = template_file.batch_template(DFI_NUMBER, BATCH_NAME)
+        for _ in range(1000):
+            template_file.new_batch_from_template(template)
+        for batch in template_file.batch_records:
+            batch.finalize()
+        eq(template_file.batch_records[-1].batch_control_record[87:94], '0001000')
+        eq(len({batch.generate()[:87] for batch in template_file.batch_records}), 1)
+
+
 class FakeDate:
     FAKE_DAY = datetime.datetime(year=2016, month=6, day=20)
 
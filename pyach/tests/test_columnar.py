@@ -0,0 +1,100 @@
+import datetime
+
+import pytest
+
+import pyach.ACHRecordTypes
+import pyach.columnar
+from pyach.tests.test_ACHFile import (ACCOUNT_NUMBER, BATCH_NAME, CORRECTED_RECEIVER_NAME, DFI_NUMBER, FILE_AMOUNTS,
+                                      eq)
+
+
+def collect(source, chunk_size=pyach.columnar.DEFAULT_CHUNK_SIZE):
+    tables = {}
+    for table, values in pyach.columnar.iter_chunks(source, chunk_size):
+        for name, column in values.items():
+            tables.setdefault(table, {}).setdefault(name, []).extend(column)
+    return tables
+
+
+def test_entries_table(populated_ach_file):
+    entries = collect(populated_ach_file)['entries']
+    eq(len(entries['amount']), 20)
+    eq(entries['amount'][:2], [int(FILE_AMOUNTS[0])] * 2)
+    eq(entries['account_number'][0], ACCOUNT_NUMBER)
+    eq(entries['receiver_name'][0], CORRECTED_RECEIVER_NAME)
+    eq(entries['has_addenda'][:2], [True, False])
+    eq(entries['batch_number'][-1], 2)
+    eq(entries['trace_number'][-1], DFI_NUMBER + '0000020')
+    codes = pyach.columnar.TRANSACTION_CODES
+    eq([codes[code] for code in entries['transaction_code'][:2]],
+       [pyach.ACHRecordTypes.CHECK_DEPOSIT, pyach.ACHRecordTypes.CHECK_DEBIT])
+
+
+def test_batches_and_addenda_tables(populated_ach_file):
+    tables = collect(populated_ach_file)
+    batches = tables['batches']
+    eq(batches['batch_number'], [1, 2])
+    eq(batches['company_name'], [BATCH_NAME, BATCH_NAME])
+    eq(batches['entry_count'], [15, 15])
+    eq(batches['total_debit_amount'][0], sum(map(int, FILE_AMOUNTS)))
+    eq(batches['effective_entry_date'][0], datetime.date(2016, 6, 21))
+    eq(pyach.columnar.SERVICE_CLASS_CODES[batches['service_class'][0]], pyach.ACHRecordTypes.MIXED)
+    addenda = tables['addenda']
+    eq(addenda['main_detail'], ['test'] * 10)
+    eq(addenda['trace_number'][0], DFI_NUMBER + '0000001')
+
+
+def test_saved_file_matches_objects(populated_ach_file, tmp_path):
+    path = str(tmp_path / 'ach.txt')
+    populated_ach_file.save(path)
+    eq(collect(path, chunk_size=3), collect(populated_ach_file))
+
+
+def test_chunk_size(populated_ach_file):
+    sizes = [len(values['amount']) for table, values in pyach.columnar.iter_chunks(populated_ach_file, 8)
+             if table == 'entries']
+    eq(sizes, [8, 8, 4])
+
+
+def test_unknown_format(populated_ach_file, tmp_path):
+    with pytest.raises(ValueError):
+        pyach.columnar.export(populated_ach_file, str(tmp_path / 'ach'), 'csv')
+
+
+def test_export_npz(populated_ach_file, tmp_path):
+    numpy = pytest.importorskip('numpy')
+    paths = pyach.columnar.export(populated_ach_file, str(tmp_path / 'ach'), pyach.columnar.NPZ, chunk_size=8)
+    eq(len(paths['entries']), 3)
+    with numpy.load(paths['batches'][0]) as batches:
+        eq(str(batches['effective_entry_date'][0]), '2016-06-21')
+
+
+@pytest.mark.parametrize('file_format', [pyach.columnar.PARQUET, pyach.columnar.ARROW])
+def test_export_arrow(populated_ach_file, tmp_path, monkeypatch, file_format):
+    pyarrow = pytest.importorskip('pyarrow')
+    paths = pyach.columnar.export(populated_ach_file, str(tmp_path / 'ach'), file_format, chunk_size=8)
+    monkeypatch.undo()  # pyarrow's readers import modules that can't load with a fake datetime.
+    if file_format == pyach.columnar.PARQUET:
+        table = pyarrow.parquet.read_table(paths['entries'][0])
+    else:
+        table = pyarrow.ipc.open_file(paths['entries'][0]).read_all()
+    eq(table.num_rows, 20)
+    eq(table.column('transaction_code')[0].as_py(), pyach.ACHRecordTypes.CHECK_DEPOSIT)
+
+
+@pytest.mark.parametrize('file_format', [pyach.columnar.NPZ, pyach.columnar.PARQUET])
+def test_blank_categories_are_null(populated_ach_file, tmp_path, monkeypatch, file_format):
+    pytest.importorskip('numpy' if file_format == pyach.columnar.NPZ else 'pyarrow')
+    for batch in populated_ach_file.batch_records:
+        batch.entry_class_code = ''
+    eq(collect(populated_ach_file)['batches']['entry_class_code'], [None, None])
+    paths = pyach.columnar.export(populated_ach_file, str(tmp_path / 'ach'), file_format)
+    monkeypatch.undo()
+    if file_format == pyach.columnar.NPZ:
+        import numpy
+        with numpy.load(paths['batches'][0]) as batches:
+            eq(batches['entry_class_code'].tolist(), [-1, -1])
+            eq(batches['service_class'].tolist(), [0, 0])
+    else:
+        import pyarrow.parquet
+        eq(pyarrow.parquet.read_table(paths['batches'][0]).column('entry_class_code').to_pylist(), [None, None])
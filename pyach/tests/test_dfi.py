@@ -0,0 +1,110 @@
+import collections
+
+import pyach.ACHRecordTypes
+import pyach.sorting
+from pyach.tests.conftest import SECOND_ROUTING_NUMBER
+from pyach.tests.test_ACHFile import ACCOUNT_NUMBER, BATCH_NAME, DESTINATION_ROUTING_NUMBER, DFI_NUMBER, eq
+from pyach.tests.test_spool import add_entries
+
+
+def old_entry_hash(batch):
+    return sum(int(str(entry.routing_number)[:8]) for entry in batch.entry_records if str(entry.routing_number))
+
+
+def test_entry_hash_is_summed_over_dfis(populated_ach_file):
+    first, second = populated_ach_file.batch_records
+    eq(first.dfi_counts, collections.Counter({'12345678': 10}))
+    eq(second.dfi_counts, collections.Counter({'02100002': 10}))
+    eq((first.entry_hash, second.entry_hash), (old_entry_hash(first), old_entry_hash(second)))
+    eq(populated_ach_file.entry_hash, str(old_entry_hash(first) + old_entry_hash(second))[-10:])
+
+
+def test_changed_routing_number_is_counted(populated_ach_file):
+    batch = populated_ach_file.batch_records[0]
+    batch.entry_records[3].routing_number = SECOND_ROUTING_NUMBER
+    batch.entry_records[4].routing_number = ''
+    eq(batch.dfi_counts, collections.Counter({'12345678': 8, '02100002': 1, '': 1}))
+    eq(batch.entry_hash, old_entry_hash(batch))
+
+
+def test_entries_added_directly_are_counted(populated_ach_file):
+    batch = populated_ach_file.batch_records[0]
+    batch.entry_records.append(populated_ach_file.batch_records[1].entry_records[0])
+    eq(batch.dfi_counts['02100002'], 1)
+    eq(batch.entry_hash, old_entry_hash(batch))
+    batch.add_entry(pyach.ACHRecordTypes.CHECK_DEBIT, SECOND_ROUTING_NUMBER, ACCOUNT_NUMBER, 1, '', '')
+    eq(batch.dfi_counts, collections.Counter({'12345678': 10, '02100002': 2}))
+
+
+def test_spooled_and_template_batches(fixed_dates):
+    ach_file = pyach.ACHRecordTypes.ACHFile()
+    template = ach_file.batch_template(DFI_NUMBER, BATCH_NAME)
+    ach_file.new_batch(DFI_NUMBER, BATCH_NAME, spool_after=2)
+    ach_file.new_batch_from_template(template)
+    ach_file.new_batch_from_template(template)
+    for batch in ach_file.batch_records:
+        add_entries(batch)
+        eq(batch.dfi_counts, collections.Counter({'12345678': 10}))
+        eq(batch.entry_hash, 123456780)
+
+
+def test_dfi_breakdown(populated_ach_file):
+    breakdown = populated_ach_file.dfi_breakdown()
+    eq(list(breakdown), ['02100002', '12345678'])
+    for prefix, batch in zip(breakdown, reversed(populated_ach_file.batch_records)):
+        eq(breakdown[prefix], pyach.ACHRecordTypes.DFITotals(10, batch.total_debit_amount, batch.total_credit_amount))
+    batch = populated_ach_file.batch_records[0]
+    batch.entry_records[0].routing_number = SECOND_ROUTING_NUMBER
+    eq(populated_ach_file.dfi_breakdown()['02100002'].entry_count, 11)
+    eq(batch.dfi_breakdown()['12345678'].entry_count, 9)
+
+
+def test_entries_changed_in_place_are_counted(populated_ach_file):
+    first, second = populated_ach_file.batch_records
+    eq(first.entry_hash, 123456780)
+    first.entry_records[0] = second.entry_records[0]
+    eq(first.entry_hash, old_entry_hash(first))
+    first.entry_records.append(first.entry_records.pop(1))
+    eq(first.entry_hash, old_entry_hash(first))
+    entry = first.entry_records.pop(2)
+    first.entry_records.append(second.entry_records[1])
+    eq(first.entry_hash, old_entry_hash(first))
+    first.entry_records[3:5] = [entry]
+    eq(first.entry_hash, old_entry_hash(first))
+    eq(sum(first.dfi_counts.values()), len(first.entry_records))
+
+
+def test_assigned_entry_list_is_counted(populated_ach_file):
+    first, second = populated_ach_file.batch_records
+    entries = list(first.entry_records)
+    first.entry_records = entries
+    entries[0] = second.entry_records[0]
+    eq(first.entry_hash, old_entry_hash(first))
+    first.sort_entries(pyach.sorting.routing_number)
+    eq(first.entry_hash, old_entry_hash(first))
+    first.entry_records[0] = second.entry_records[1]
+    eq(first.entry_hash, old_entry_hash(first))
+
+
+def test_changes_only_recount_the_entrys_batches(populated_ach_file):
+    first, second = populated_ach_file.batch_records
+    eq((first.entry_hash, second.entry_hash), (old_entry_hash(first), old_entry_hash(second)))
+    counts = first.dfi_counts
+    second.entry_records[0].routing_number = DESTINATION_ROUTING_NUMBER
+    assert first.dfi_counts is counts
+    eq(second.dfi_counts['12345678'], 1)
+    first.entry_records.append(second.entry_records[1])
+    eq(first.dfi_counts['02100002'], 1)
+    second.entry_records[1].routing_number = DESTINATION_ROUTING_NUMBER
+    eq((first.entry_hash, second.entry_hash), (old_entry_hash(first), old_entry_hash(second)))
+
+
+def test_dfi_breakdown_follows_amounts_and_codes(populated_ach_file):
+    batch = populated_ach_file.batch_records[0]
+    eq(batch.dfi_breakdown()['12345678'].total_debit_amount, batch.total_debit_amount)
+    entry = next(entry for entry in batch.entry_records if entry.transaction_code in pyach.ACHRecordTypes.DEBIT_CODES)
+    entry.amount += 5
+    eq(batch.dfi_breakdown()['12345678'].total_debit_amount, batch.total_debit_amount)
+    entry.transaction_code = pyach.ACHRecordTypes.CHECK_DEPOSIT
+    eq(batch.dfi_breakdown()['12345678'], pyach.ACHRecordTypes.DFITotals(10, batch.total_debit_amount,
+                                                                         batch.total_credit_amount))
@@ -0,0 +1,285 @@
+import decimal
+import gzip
+import hashlib
+import random
+import string
+import time
+
+import pytest
+
+import pyach.ACHRecordTypes
+import pyach.pipeline
+import pyach.sorting
+import pyach.streams
+from pyach.tests.conftest import THROUGHPUT
+from pyach.tests.test_ACHFile import (COMPANY_IDENTIFICATION_NUMBER, DESTINATION_NAME, DESTINATION_ROUTING_NUMBER,
+                                      ENTRY_CLASS_CODE, ENTRY_DESCRIPTION, ORIGIN_NAME, eq)
+
+SEEDS = range(12)
+LARGE_SEED = 1000
+# Characters is_alphanumeric strips out of names.
+PUNCTUATION = " '-.,&/#_"
+TRANSACTION_CODES = [pyach.ACHRecordTypes.CHECK_DEPOSIT, pyach.ACHRecordTypes.CHECK_DEBIT,
+                     pyach.ACHRecordTypes.SAVINGS_DEPOSIT, pyach.ACHRecordTypes.SAVINGS_DEBIT,
+                     pyach.ACHRecordTypes.PRE_CHECK_CREDIT]
+# Decimal precision is 10 digits, so the file's debit and credit totals have to stay below this many cents.
+MAX_FILE_TOTAL = 10 ** 10
+
+
+# Strategies
+def text(generator, max_length, alphabet=string.ascii_letters + string.digits + PUNCTUATION):
+    return ''.join(generator.choice(alphabet) for _ in range(generator.randrange(max_length + 1)))
+
+
+def digits(generator, length):
+    return ''.join(generator.choice(string.digits) for _ in range(length))
+
+
+def amounts(generator, count, budget):
+    # Mostly small payments with a few very large ones, all distinct so sorting by amount is unambiguous.
+    seen = set()
+    for _ in range(count):
+        cents = generator.randrange(10 ** 5) if generator.random() < 0.9 else generator.randrange(10 ** 9)
+        cents = min(cents, max(budget[0], 0))  # Amounts are never negative, even once the budget is spent.
+        while cents in seen:
+            cents += 1
+        seen.add(cents)
+        budget[0] -= cents
+        yield '{0}.{1:02d}'.format(*divmod(cents, 100))
+
+
+def addenda(generator):
+    count = generator.choice([0, 0, 0, 1, 2, generator.randrange(3, 40)])
+    return [(text(generator, 100, string.printable[:-5]), pyach.ACHRecordTypes.CTX) for _ in range(count)]
+
+
+def ach_file_specs(generator, max_batches=4, max_entries=30):
+    batches = []
+    budget = [MAX_FILE_TOTAL // 2]
+    for _ in range(generator.randrange(1, max_batches + 1)):
+        # Pick entry counts around block boundaries, where the footer padding changes.
+        count = generator.choice([0, 1, 6, 7, 8, generator.randrange(max_entries + 1)])
+        entries = [((generator.choice(TRANSACTION_CODES), digits(generator, 9), text(generator, 20), amount,
+                     text(generator, 18), text(generator, 26), text(generator, 3)), addenda(generator))
+                   for amount in amounts(generator, count, budget)]
+        batches.append({'dfi_number': digits(generator, 8),
+                        'batch_name': text(generator, 20),
+                        'discretionary_data': text(generator, 24),
+                        'service_class': generator.choice([pyach.ACHRecordTypes.MIXED, pyach.ACHRecordTypes.CREDIT,
+                                                           pyach.ACHRecordTypes.DEBIT]),
+                        'entries': entries})
+    return {'reference_code': text(generator, 10), 'batches': batches}
+
+
+def without_addenda(spec):
+    return dict(spec, batches=[dict(batch, entries=[(entry, []) for entry, _ in batch['entries']])
+                               for batch in spec['batches']])
+
+
+def sorted_by_amount(spec):
+    return dict(spec, batches=[dict(batch, entries=sorted(batch['entries'],
+                                                          key=lambda entry: decimal.Decimal(entry[0][3])))
+                               for batch in spec['batches']])
+
+
+FILE_ATTRIBUTES = {'destination_routing_number': DESTINATION_ROUTING_NUMBER,
+                   'destination_name': DESTINATION_NAME,
+                   'origin_id': COMPANY_IDENTIFICATION_NUMBER,
+                   'origin_name': ORIGIN_NAME,
+                   'company_identification_number': COMPANY_IDENTIFICATION_NUMBER,
+                   'entry_class_code': ENTRY_CLASS_CODE,
+                   'entry_description': ENTRY_DESCRIPTION}
+
+
+def build(spec, remittance=False, spool_after=None, templates=False):
+    ach_file = pyach.ACHRecordTypes.ACHFile()
+    for name, value in FILE_ATTRIBUTES.items():
+        setattr(ach_file, name, value)
+    ach_file.reference_code = spec['reference_code']
+    ach_file.create_header()
+    for batch in spec['batches']:
+        if templates:
+            template = ach_file.batch_template(batch['dfi_number'], batch['batch_name'],
+                                               discretionary_data=batch['discretionary_data'],
+                                               service_class=batch['service_class'])
+            ach_file.new_batch_from_template(template, spool_after=spool_after)
+        else:
+            ach_file.new_batch(batch['dfi_number'], batch['batch_name'],
+                               discretionary_data=batch['discretionary_data'], service_class=batch['service_class'],
+                               spool_after=spool_after)
+        for entry, entry_addenda in batch['entries']:
+            ach_file.batch_records[-1].add_entry(*entry)
+            if remittance and entry_addenda:
+                # The strategy gives every addenda record of an entry the same type code.
+                payload = ''.join(main_detail[:80].ljust(80) for main_detail, _ in entry_addenda)
+                ach_file.batch_records[-1].entry_records[-1].add_remittance(payload, entry_addenda[0][1])
+                continue
+            for main_detail, type_code in entry_addenda:
+                ach_file.batch_records[-1].entry_records[-1].add_addenda(main_detail, type_code)
+    return ach_file
+
+
+def reference(spec):
+    """Renders spec one generate() call at a time, in the layout save() has always written."""
+    ach_file = build(spec)
+    records = [ach_file._file_header.generate()]
+    for batch in ach_file.batch_records:
+        records.append(batch.generate())
+        for entry in batch.entry_records:
+            records.append(entry.generate())
+            records.extend(addenda.generate() for addenda in entry.addenda_records)
+        records.append(pyach.ACHRecordTypes.BatchControl(batch.entry_count, batch.entry_hash,
+                                                         batch.total_debit_amount, batch.total_credit_amount,
+                                                         batch.company_identification_number,
+                                                         batch.originator_dfi_identification, batch.batch_number,
+                                                         batch.service_class).generate())
+    line_count = len(records) + 1
+    block_count = line_count // 10 + 1
+    records.append(pyach.ACHRecordTypes.FileControl(ach_file.batch_count, block_count, ach_file.entry_count,
+                                                    ach_file.entry_hash, ach_file.total_debit_amount,
+                                                    ach_file.total_credit_amount).generate())
+    records.extend(['\n' + '9' * 94] * (10 - line_count % 10))
+    return ''.join(records).encode()
+
+
+# Engines write spec to path and should produce exactly the reference bytes.
+# They can return a function that makes further checks once they've been timed.
+ENGINES = {}
+
+
+def engine(name, supports_addenda=True, sorted_spec=False):
+    def register(function):
+        ENGINES[name] = (function, supports_addenda, sorted_spec)
+        return function
+    return register
+
+
+@engine('save')
+def save_engine(spec, path):
+    build(spec).save(path)
+
+
+@engine('remittance addenda')
+def remittance_engine(spec, path):
+    build(spec, remittance=True).save(path)
+
+
+@engine('spooled save')
+def spooled_save_engine(spec, path):
+    build(spec, spool_after=3).save(path)
+
+
+@engine('batch templates')
+def batch_templates_engine(spec, path):
+    build(spec, templates=True).save(path)
+
+
+@engine('output streams')
+def output_streams_engine(spec, path):
+    sha256 = pyach.streams.HashStream()
+    archive = pyach.streams.GzipStream(path + '.gz')
+    build(spec).save(path, [sha256, archive])
+
+    def check(data):
+        eq(sha256.hexdigest, hashlib.sha256(data).hexdigest())
+        with gzip.open(archive.path) as file:
+            eq(file.read(), data)
+    return check
+
+
+@engine('progress')
+def progress_engine(spec, path):
+    samples = []
+    build(spec, remittance=True).save(path, progress=samples.append, progress_interval=0)
+
+    def check(data):
+        eq([sample.bytes_written for sample in samples], sorted(sample.bytes_written for sample in samples))
+        eq(samples[-1].bytes_written, len(data))
+    return check
+
+
+@engine('sorted save', sorted_spec=True)
+def sorted_save_engine(spec, path):
+    shuffled = dict(spec, batches=[dict(batch, entries=random.Random(len(batch['entries'])).sample(
+        batch['entries'], len(batch['entries']))) for batch in spec['batches']])
+    build(shuffled).save(path, sort_key=pyach.sorting.amount, max_in_memory=4)
+
+
+@engine('sorted spooled save', sorted_spec=True)
+def sorted_spooled_save_engine(spec, path):
+    shuffled = dict(spec, batches=[dict(batch, entries=random.Random(len(batch['entries'])).sample(
+        batch['entries'], len(batch['entries']))) for batch in spec['batches']])
+    with build(shuffled, remittance=True, spool_after=3) as ach_file:
+        ach_file.save(path, sort_key=pyach.sorting.amount, max_in_memory=4)
+
+
+@engine('pipeline', supports_addenda=False)
+def pipeline_engine(spec, path):
+    batches = [pyach.pipeline.BatchSpec(batch['dfi_number'], batch['batch_name'],
+                                        [entry for entry, _ in batch['entries']],
+                                        discretionary_data=batch['discretionary_data'],
+                                        service_class=batch['service_class'])
+               for batch in spec['batches']]
+    file_spec = pyach.pipeline.FileSpec(path, batches, reference_code=spec['reference_code'], **FILE_ATTRIBUTES)
+    # A second file to the same destination keeps both workers busy and takes modifier B.
+    other_spec = pyach.pipeline.FileSpec(path + '.other', batches, reference_code=spec['reference_code'],
+                                         **FILE_ATTRIBUTES)
+    manifest = pyach.pipeline.run([file_spec, other_spec], max_workers=2)
+
+    def check(data):
+        eq([file['file_id_modifier'] for file in manifest.files], ['A', 'B'])
+        other = read_bytes(other_spec.file_path)
+        eq(other[:33] + other[34:], data[:33] + data[34:])
+    return check
+
+
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def record_throughput(name, records, seconds):
+    total_records, total_seconds = THROUGHPUT.get(name, (0, 0))
+    THROUGHPUT[name] = (total_records + records, total_seconds + seconds)
+
+
+def check_engine(name, spec, tmp_path):
+    function, supports_addenda, sorted_spec = ENGINES[name]
+    if not supports_addenda:
+        spec = without_addenda(spec)
+    reference_spec = sorted_by_amount(spec) if sorted_spec else spec
+    start = time.perf_counter()
+    expected = reference(reference_spec)
+    record_throughput('reference', expected.count(b'\n') + 1, time.perf_counter() - start)
+    path = str(tmp_path / (name.replace(' ', '_') + '.txt'))
+    start = time.perf_counter()
+    check = function(spec, path)
+    seconds = time.perf_counter() - start
+    actual = read_bytes(path)
+    record_throughput(name, actual.count(b'\n') + 1, seconds)
+    eq(len(actual) % 95, 94)
+    eq(actual, expected)
+    if check is not None:
+        check(actual)
+
+
+@pytest.mark.parametrize('name', sorted(ENGINES))
+@pytest.mark.parametrize('seed', SEEDS)
+def test_engine_matches_reference(fixed_dates, tmp_path, name, seed):
+    check_engine(name, ach_file_specs(random.Random(seed)), tmp_path)
+
+
+@pytest.mark.parametrize('name', sorted(ENGINES))
+def test_engine_matches_reference_on_large_file(fixed_dates, tmp_path, name):
+    check_engine(name, ach_file_specs(random.Random(LARGE_SEED), max_batches=10, max_entries=2000), tmp_path)
+
+
+@pytest.mark.parametrize('name', sorted(ENGINES))
+@pytest.mark.parametrize('entry_count', [5, 6, 7])
+def test_engine_matches_reference_at_block_boundaries(fixed_dates, tmp_path, name, entry_count):
+    # Header, file control and the batch header and control are four lines, so six entries fill one block.
+    entries = [((pyach.ACHRecordTypes.CHECK_DEBIT, DESTINATION_ROUTING_NUMBER, str(index), '{0}.00'.format(index),
+                 '', '', ''), []) for index in range(1, entry_count + 1)]
+    spec = {'reference_code': '', 'batches': [{'dfi_number': '12345678', 'batch_name': '', 'discretionary_data': '',
+                                               'service_class': pyach.ACHRecordTypes.DEBIT, 'entries': entries}]}
+    check_engine(name, spec, tmp_path)
@@ -0,0 +1,64 @@
+import decimal
+
+import pytest
+
+import pyach.patch
+from pyach.tests.conftest import SECOND_ROUTING_NUMBER
+from pyach.tests.test_ACHFile import DFI_NUMBER, eq
+
+
+def read(path):
+    with open(path) as file:
+        return file.read()
+
+
+def without_file_id_modifier(data):
+    return data[:33] + data[34:]
+
+
+def test_patch_matches_regenerated_file(populated_ach_file, tmp_path):
+    path, expected_path = str(tmp_path / 'patched.txt'), str(tmp_path / 'expected.txt')
+    populated_ach_file.save(path)
+    with pyach.patch.PatchableFile(path) as ach_file:
+        line_index = ach_file.patch_entry(trace_number=DFI_NUMBER + '0000004', amount='12.34',
+                                          routing_number=SECOND_ROUTING_NUMBER, account_number='42')
+        ach_file.patch_entry(trace_number=DFI_NUMBER + '0000013', amount=0)
+        eq(ach_file.record(line_index)[12:29].strip(), '42')
+    entry = populated_ach_file.batch_records[0].entry_records[3]
+    entry.amount = decimal.Decimal('12.34')
+    entry.routing_number = SECOND_ROUTING_NUMBER
+    entry._account_number = '42'
+    populated_ach_file.batch_records[1].entry_records[2].amount = decimal.Decimal(0)
+    populated_ach_file.save(expected_path)
+    eq(without_file_id_modifier(read(path)), without_file_id_modifier(read(expected_path)))
+
+
+def test_patch_by_line_index(populated_ach_file, tmp_path):
+    path = str(tmp_path / 'patched.txt')
+    populated_ach_file.save(path)
+    with pyach.patch.PatchableFile(path) as ach_file:
+        eq(len(ach_file), 40)
+        eq(ach_file.find_file_control(), 35)
+        eq(ach_file.find_entry(DFI_NUMBER + '0000002'), 4)
+        ach_file.patch_entry(4, receiver_name='Arya')
+        with pytest.raises(ValueError):
+            ach_file.patch_entry(3, amount=1)
+        with pytest.raises(ValueError):
+            ach_file.patch_entry(4, batch_number=1)
+        with pytest.raises(KeyError):
+            ach_file.find_entry(DFI_NUMBER + '0009999')
+    eq(read(path).split('\n')[4][54:76].strip(), 'Arya')
+
+
+@pytest.mark.parametrize('fields', [{'account_number': '999', 'amount': '12,50'},
+                                    {'account_number': '999', 'routing_number': 'ABCDEFGHI'},
+                                    {'amount': '-5'},
+                                    {'amount': '123456789012'}])
+def test_failed_patch_leaves_file_unchanged(populated_ach_file, tmp_path, fields):
+    path = str(tmp_path / 'patched.txt')
+    populated_ach_file.save(path)
+    original = read(path)
+    with pyach.patch.PatchableFile(path) as ach_file:
+        with pytest.raises(ValueError):
+            ach_file.patch_entry(2, **fields)
+    eq(read(path), original)
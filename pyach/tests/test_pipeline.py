@@ -0,0 +1,84 @@
+import decimal
+
+import pytest
+
+import pyach.ACHRecordTypes
+import pyach.pipeline
+from pyach.tests.test_ACHFile import (ACCOUNT_NUMBER, AMOUNTS, BATCH_NAME, COMPANY_IDENTIFICATION_NUMBER,
+                                      DESTINATION_NAME, DESTINATION_ROUTING_NUMBER, DFI_NUMBER, ENTRY_CLASS_CODE,
+                                      INDIVIDUAL_IDENTIFICATION_NUMBER, ORIGIN_NAME, RECEIVER_NAME, eq)
+
+ATTRIBUTES = {'destination_routing_number': DESTINATION_ROUTING_NUMBER,
+              'destination_name': DESTINATION_NAME,
+              'origin_id': COMPANY_IDENTIFICATION_NUMBER,
+              'origin_name': ORIGIN_NAME,
+              'company_identification_number': COMPANY_IDENTIFICATION_NUMBER,
+              'entry_class_code': ENTRY_CLASS_CODE}
+
+
+def entries():
+    return [(pyach.ACHRecordTypes.CHECK_DEPOSIT, DESTINATION_ROUTING_NUMBER, ACCOUNT_NUMBER, amount,
+             INDIVIDUAL_IDENTIFICATION_NUMBER, RECEIVER_NAME) for amount in AMOUNTS]
+
+
+def make_specs(tmp_path, count):
+    return [pyach.pipeline.FileSpec(str(tmp_path / 'file{0}.txt'.format(index)),
+                                    [pyach.pipeline.BatchSpec(DFI_NUMBER, BATCH_NAME, entries),
+                                     pyach.pipeline.BatchSpec(DFI_NUMBER, BATCH_NAME, entries()[:index + 1])],
+                                    **ATTRIBUTES)
+            for index in range(count)]
+
+
+def read(path):
+    with open(path) as file:
+        return file.read()
+
+
+def test_manifest(fixed_dates, tmp_path):
+    manifest = pyach.pipeline.run(make_specs(tmp_path, 4), max_workers=2, max_pending=1)
+    eq([file['file_path'] for file in manifest.files], [str(tmp_path / 'file{0}.txt'.format(i)) for i in range(4)])
+    eq([file['file_id_modifier'] for file in manifest.files], ['A', 'B', 'C', 'D'])
+    eq([file['entry_count'] for file in manifest.files], [6, 7, 8, 9])
+    eq(manifest.entry_count, 30)
+    eq(manifest.total_credit_amount.quantize(decimal.Decimal('.01')), decimal.Decimal('4100863.92'))
+    eq(manifest.total_debit_amount, 0)
+    assert manifest.seconds > 0
+
+
+def test_matches_serial_build(fixed_dates, tmp_path):
+    specs = make_specs(tmp_path, 3)
+    manifest = pyach.pipeline.run(specs, max_workers=2)
+    eq([spec.file_id_modifier for spec in specs], [None] * 3)
+    for spec, file in zip(specs, manifest.files):
+        pipeline_output = read(spec.file_path)
+        spec.file_path += '.serial'
+        pyach.pipeline.build_file(spec, pyach.ACHRecordTypes.today_with_format,
+                                  pyach.ACHRecordTypes.now_with_format, file['file_id_modifier'])
+        eq(read(spec.file_path), pipeline_output)
+    eq(pipeline_output[33], 'C')
+
+
+def test_explicit_file_id_modifiers_are_skipped():
+    specs = [pyach.pipeline.FileSpec('', [], modifier, destination_routing_number=destination)
+             for modifier, destination in (('B', '1'), (None, '1'), (None, '2'), (None, '1'), ('1', '2'))]
+    eq([modifier for _, modifier in pyach.pipeline.assign_file_id_modifiers(specs)], ['B', 'A', 'A', 'C', '1'])
+    eq([spec.file_id_modifier for spec in specs], ['B', None, None, None, '1'])
+
+
+def test_given_file_id_modifiers_are_reserved():
+    specs = [pyach.pipeline.FileSpec('', [], modifier) for modifier in (None, 'A', None)]
+    eq([modifier for _, modifier in pyach.pipeline.assign_file_id_modifiers(specs)], ['B', 'A', 'C'])
+
+
+def test_repeated_file_id_modifier(tmp_path):
+    specs = make_specs(tmp_path, 3)
+    specs[0].file_id_modifier = specs[2].file_id_modifier = 'A'
+    with pytest.raises(ValueError):
+        pyach.pipeline.run(specs, max_workers=1)
+    assert not (tmp_path / 'file0.txt').exists()
+
+
+def test_lazy_specs_cannot_mix_file_id_modifiers():
+    specs = (pyach.pipeline.FileSpec('', [], modifier) for modifier in (None, 'C'))
+    with pytest.raises(ValueError):
+        list(pyach.pipeline.assign_file_id_modifiers(specs))
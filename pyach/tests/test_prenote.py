@@ -0,0 +1,74 @@
+import pytest
+
+import pyach.ACHRecordTypes
+import pyach.prenote
+from pyach.tests.conftest import SECOND_ROUTING_NUMBER
+from pyach.tests.test_ACHFile import (ACCOUNT_NUMBER, BATCH_NAME, DESTINATION_ROUTING_NUMBER, DFI_NUMBER,
+                                      RECEIVER_NAME, eq)
+
+
+def test_prenote_file(populated_ach_file, tmp_path):
+    prenotes = pyach.prenote.prenote_file(populated_ach_file)
+    eq(prenotes.batch_count, 2)
+    eq([entry.transaction_code for entry in prenotes.batch_records[0].entry_records],
+       [pyach.ACHRecordTypes.PRE_CHECK_CREDIT, pyach.ACHRecordTypes.PRE_CHECK_DEBIT])
+    eq(prenotes.batch_records[1].entry_records[0].routing_number, SECOND_ROUTING_NUMBER)
+    eq(prenotes.batch_records[0].company_name, BATCH_NAME)
+    path = str(tmp_path / 'prenote.txt')
+    prenotes.save(path)
+    with open(path) as file:
+        entries = [line for line in file if line.startswith('6')]
+    eq([entry[29:39] for entry in entries], ['0000000000'] * 4)
+    eq(entries[-1][79:94], DFI_NUMBER + '0000004')
+
+
+def test_registry_skips_prenoted_accounts(populated_ach_file, tmp_path):
+    path = str(tmp_path / 'prenoted')
+    with pyach.prenote.PrenoteRegistry(path) as registry:
+        prenotes = pyach.prenote.prenote_file(populated_ach_file, registry)
+        eq(prenotes.entry_count, 4)
+        eq(len(registry.pending), 4)
+        prenotes.save(str(tmp_path / 'prenote.txt'))
+        registry.commit()
+        eq(registry.pending, set())
+    with pyach.prenote.PrenoteRegistry(path) as registry:
+        eq(len(registry), 4)
+        prenotes = pyach.prenote.prenote_file(populated_ach_file, registry)
+    eq(prenotes.batch_count, 0)
+    eq(prenotes.has_payments, False)
+
+
+def test_prenote_entries():
+    accounts = [(pyach.ACHRecordTypes.SAVINGS_DEPOSIT, DESTINATION_ROUTING_NUMBER, ACCOUNT_NUMBER, '', RECEIVER_NAME,
+                 ''),
+                (pyach.ACHRecordTypes.SAVINGS_DEBIT, DESTINATION_ROUTING_NUMBER, ACCOUNT_NUMBER, '', RECEIVER_NAME,
+                 '')]
+    eq([entry[0] for entry in pyach.prenote.prenote_entries(accounts * 2)],
+       [pyach.ACHRecordTypes.PRE_SAVINGS_CREDIT, pyach.ACHRecordTypes.PRE_SAVINGS_DEBIT])
+    with pytest.raises(ValueError):
+        list(pyach.prenote.prenote_entries([(pyach.ACHRecordTypes.REMIT_CHECK_CREDIT,) + accounts[0][1:]]))
+
+
+def test_uncommitted_prenotes_are_not_recorded(populated_ach_file, tmp_path):
+    path = str(tmp_path / 'prenoted')
+    with pyach.prenote.PrenoteRegistry(path) as registry:
+        eq(pyach.prenote.prenote_file(populated_ach_file, registry).entry_count, 4)
+        eq(len(registry), 0)
+    with pyach.prenote.PrenoteRegistry(path) as registry:
+        eq(pyach.prenote.prenote_file(populated_ach_file, registry).entry_count, 4)
+        registry.rollback()
+        registry.commit()
+        eq(len(registry), 0)
+
+
+def test_spooled_prenote_file(populated_ach_file, tmp_path):
+    prenotes = pyach.prenote.prenote_file(populated_ach_file)
+    spooled = pyach.prenote.prenote_file(populated_ach_file, spool_after=1)
+    assert all(batch.is_spooled for batch in spooled.batch_records)
+    eq(len(spooled.batch_records[0].entry_records), 2)
+    paths = str(tmp_path / 'prenote.txt'), str(tmp_path / 'spooled.txt')
+    prenotes.save(paths[0])
+    spooled.save(paths[1])
+    with open(paths[0]) as expected, open(paths[1]) as actual:
+        eq(actual.read(), expected.read())
+    spooled.close()
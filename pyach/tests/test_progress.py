@@ -0,0 +1,56 @@
+import os
+
+import pyach.progress
+from pyach.tests.test_ACHFile import eq
+
+
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_save_reports_progress(populated_ach_file, tmp_path):
+    plain, reported = str(tmp_path / 'plain.txt'), str(tmp_path / 'reported.txt')
+    populated_ach_file.save(plain)
+    samples = []
+    populated_ach_file.save(reported, progress=samples.append, progress_interval=0)
+    plain, reported = read_bytes(plain), read_bytes(reported)
+    eq(reported[:33] + reported[34:], plain[:33] + plain[34:])
+
+    # One sample after each batch and one at the end.
+    eq([(sample.batches, sample.entries, sample.bytes_written) for sample in samples],
+       [(1, 15, 18 * 95), (2, 30, 35 * 95), (2, 30, len(reported))])
+    final = samples[-1]
+    eq((final.batch_count, final.entry_count, final.total_bytes), (2, 30, len(reported)))
+    eq((final.done, final.fraction, final.eta), (True, 1.0, 0.0))
+    assert final.rss > 0
+    assert all(later.elapsed >= earlier.elapsed for earlier, later in zip(samples, samples[1:]))
+
+
+def test_save_samples_inside_batches(populated_ach_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(pyach.progress, 'SAMPLE_EVERY', 4)
+    samples = list(populated_ach_file.iter_save(str(tmp_path / 'ach.txt'), progress_interval=0))
+    eq([(sample.batches, sample.entries) for sample in samples],
+       [(0, 3), (0, 7), (0, 11), (0, 15), (1, 15), (1, 18), (1, 22), (1, 26), (1, 30), (2, 30), (2, 30)])
+    assert not samples[0].done
+    assert samples[0].eta is not None
+
+
+def test_save_without_due_samples_reports_once(populated_ach_file, tmp_path):
+    samples = []
+    populated_ach_file.save(str(tmp_path / 'ach.txt'), progress=samples.append, progress_interval=3600)
+    eq(len(samples), 1)
+    assert samples[0].done
+
+
+def test_closing_iter_save_stops_the_save(populated_ach_file, tmp_path):
+    path = str(tmp_path / 'ach.txt')
+    saving = populated_ach_file.iter_save(path, progress_interval=0)
+    eq(next(saving).batches, 1)
+    saving.close()
+    assert os.path.getsize(path) < 40 * 95 - 1
+    eq(populated_ach_file.file_name, '')
+
+
+def test_rss_bytes():
+    assert pyach.progress.rss_bytes() > 0
@@ -0,0 +1,66 @@
+import datetime
+
+import pyach.reconcile
+from pyach.tests.conftest import SECOND_ROUTING_NUMBER
+from pyach.tests.test_ACHFile import ACCOUNT_NUMBER, AMOUNTS, DESTINATION_ROUTING_NUMBER, DFI_NUMBER, eq
+
+EFFECTIVE_DATE = datetime.date(2016, 6, 21)
+
+
+def settlement_rows():
+    rows = []
+    for batch, routing_number in enumerate((DESTINATION_ROUTING_NUMBER, SECOND_ROUTING_NUMBER)):
+        for index, amount in enumerate(AMOUNTS * 2):
+            trace_number = DFI_NUMBER + str(batch * 10 + index + 1).rjust(7, '0')
+            rows.append({'trace_number': trace_number, 'amount': str(amount), 'routing_number': routing_number,
+                         'account_number': ACCOUNT_NUMBER, 'effective_date': '160621'})
+    return rows
+
+
+def test_everything_matches(populated_ach_file, tmp_path):
+    # Entries alternate credit and debit for each amount, so reorder the amounts to match.
+    rows = settlement_rows()
+    amounts = [str(amount) for amount in AMOUNTS for _ in range(2)] * 2
+    for row, amount in zip(rows, amounts):
+        row['amount'] = amount
+    report = pyach.reconcile.reconcile(populated_ach_file, list(pyach.reconcile.mapping_records(rows)))
+    eq(len(report.matched), 20)
+    assert report.is_reconciled
+    path = str(tmp_path / 'ach.txt')
+    populated_ach_file.save(path)
+    report = pyach.reconcile.reconcile(path, pyach.reconcile.mapping_records(rows))
+    eq(len(report.matched), 20)
+    eq(report.matched[0][0].effective_date, EFFECTIVE_DATE)
+    eq(report.matched[0][0], report.matched[0][1])
+
+
+def test_mismatches(populated_ach_file):
+    rows = [{'trace_number': DFI_NUMBER + '0000001', 'amount': '1423.89', 'account_number': ACCOUNT_NUMBER},
+            {'trace_number': DFI_NUMBER + '0000002', 'amount': '1.00'},
+            {'trace_number': DFI_NUMBER + '0000003', 'amount': '32314.01', 'account_number': '1',
+             'effective_date': datetime.date(2016, 6, 22)},
+            {'trace_number': DFI_NUMBER + '0000099', 'amount': '5.00'}]
+    report = pyach.reconcile.reconcile(populated_ach_file.batch_records[0], pyach.reconcile.mapping_records(rows))
+    eq([ach.trace_number for ach, other in report.matched], [DFI_NUMBER + '0000001'])
+    eq([(ach.amount, other.amount) for ach, other in report.amount_mismatches], [(142389, 100)])
+    eq(report.field_mismatches[0][2], ['account_number', 'effective_date'])
+    eq([other.trace_number for other in report.unmatched_other], [DFI_NUMBER + '0000099'])
+    eq(len(report.unmatched_ach), 7)
+    assert not report.is_reconciled
+
+
+def test_custom_key(populated_ach_file):
+    records = [pyach.reconcile.Record(None, 142389, DESTINATION_ROUTING_NUMBER, ACCOUNT_NUMBER)] * 3
+    report = pyach.reconcile.reconcile(populated_ach_file, records, key=('routing_number', 'amount'))
+    eq(len(report.matched), 2)
+    eq(len(report.unmatched_other), 1)
+    eq(len(report.unmatched_ach), 18)
+
+
+def test_settlement_date_formats():
+    eq([pyach.reconcile.to_date(value) for value in ('160621', '2016-06-21', '2016-06-21T10:30:00', '', None)],
+       [EFFECTIVE_DATE, EFFECTIVE_DATE, EFFECTIVE_DATE, None, None])
+    rows = [{'trace_number': DFI_NUMBER + '0000001', 'amount': '1.00', 'effective_date': '06/21/2016'}]
+    eq(next(pyach.reconcile.mapping_records(rows, '%m/%d/%Y')).effective_date, EFFECTIVE_DATE)
+    rows[0]['effective_date'] = ' '
+    assert next(pyach.reconcile.mapping_records(rows, '%m/%d/%Y')).effective_date is None
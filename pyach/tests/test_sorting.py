@@ -0,0 +1,41 @@
+import decimal
+import random
+
+import pytest
+
+import pyach.sorting
+from pyach.tests.conftest import SECOND_ROUTING_NUMBER
+from pyach.tests.test_ACHFile import DESTINATION_ROUTING_NUMBER, DFI_NUMBER, eq
+
+
+class FakeEntry:
+    def __init__(self, routing_number, amount):
+        self.routing_number = routing_number
+        self.amount = decimal.Decimal(amount)
+
+
+@pytest.mark.parametrize('max_in_memory', [1, 7, pyach.sorting.DEFAULT_MAX_IN_MEMORY])
+def test_sort_order(max_in_memory):
+    generator = random.Random(30)
+    entries = [FakeEntry(str(generator.randrange(10 ** 8, 10 ** 9)), '{0}.{1:02d}'.format(generator.randrange(100),
+                                                                                            generator.randrange(100)))
+               for _ in range(100)]
+    entries += entries[:10]
+    key = pyach.sorting.routing_number_and_amount
+    expected = sorted(range(len(entries)), key=lambda index: key(entries[index]))
+    eq(list(pyach.sorting.sort_order(entries, key, max_in_memory)), expected)
+
+
+def test_save_sorted(populated_ach_file, tmp_path):
+    path = str(tmp_path / 'sorted.txt')
+    populated_ach_file.save(path, sort_key=pyach.sorting.amount, max_in_memory=3)
+    with open(path) as file:
+        lines = file.read().split('\n')
+    entries = [line for line in lines if line.startswith('6')]
+    eq([int(entry[29:39]) for entry in entries[:10]], sorted(int(entry[29:39]) for entry in entries[:10]))
+    eq([entry[79:94] for entry in entries], [DFI_NUMBER + str(number).rjust(7, '0') for number in range(1, 21)])
+    eq([entry[3:12] for entry in entries], [DESTINATION_ROUTING_NUMBER] * 10 + [SECOND_ROUTING_NUMBER] * 10)
+    for index, line in enumerate(lines):
+        if line.startswith('7'):
+            eq(line[87:94], lines[index - 1][87:94])
+    eq(sum(line.startswith('7') for line in lines), 10)
@@ -0,0 +1,98 @@
+import decimal
+
+import pytest
+
+import pyach.ACHRecordTypes
+import pyach.sorting
+from pyach.tests.test_ACHFile import (ACCOUNT_NUMBER, AMOUNTS, BATCH_NAME, DESTINATION_ROUTING_NUMBER, DFI_NUMBER,
+                                      DISCRETIONARY_DATA, INDIVIDUAL_IDENTIFICATION_NUMBER, RECEIVER_NAME, eq)
+
+
+def add_entries(batch):
+    for amount in AMOUNTS:
+        batch.add_entry(pyach.ACHRecordTypes.CHECK_DEPOSIT, DESTINATION_ROUTING_NUMBER, ACCOUNT_NUMBER, amount,
+                        INDIVIDUAL_IDENTIFICATION_NUMBER, RECEIVER_NAME)
+        batch.entry_records[-1].add_addenda('test', pyach.ACHRecordTypes.CCD)
+        batch.add_entry(pyach.ACHRecordTypes.CHECK_DEBIT, DESTINATION_ROUTING_NUMBER, ACCOUNT_NUMBER, amount,
+                        INDIVIDUAL_IDENTIFICATION_NUMBER, RECEIVER_NAME)
+
+
+@pytest.fixture
+def batches(fixed_dates):
+    # The same batch, built once in memory and once spooled after two entries.
+    batches = []
+    for spool_after in (None, 2):
+        ach_file = pyach.ACHRecordTypes.ACHFile()
+        ach_file.new_batch(DFI_NUMBER, BATCH_NAME, discretionary_data=DISCRETIONARY_DATA, spool_after=spool_after)
+        add_entries(ach_file.batch_records[-1])
+        batches.append(ach_file.batch_records[-1])
+    return batches
+
+
+def test_spooled_totals(batches):
+    in_memory, spooled = batches
+    assert spooled.is_spooled
+    eq(len(spooled.entry_records), 10)
+    eq(spooled.entry_records._spooled_count, 8)
+    eq(spooled.total_debit_amount, in_memory.total_debit_amount)
+    eq(spooled.total_credit_amount, in_memory.total_credit_amount)
+    eq(spooled.entry_hash, in_memory.entry_hash)
+    eq(spooled.entry_count, in_memory.entry_count)
+
+
+def test_spooled_records(batches):
+    in_memory, spooled = batches
+    in_memory.finalize()
+    spooled.finalize()
+    eq(''.join(spooled.records()), ''.join(in_memory.records()))
+    entries = list(spooled.entry_records)
+    eq(len(entries), 10)
+    eq(entries[0].trace_number, DFI_NUMBER + '0000001')
+    eq(entries[0].account_number, ACCOUNT_NUMBER)
+    eq(entries[0].amount, decimal.Decimal('1423.89'))
+    eq(entries[0].addenda_count, 1)
+    eq(entries[1].transaction_code, pyach.ACHRecordTypes.CHECK_DEBIT)
+
+
+def test_spooled_indexing(batches):
+    spooled = batches[1].entry_records
+    spooled[-1].add_addenda('late', pyach.ACHRecordTypes.CCD)
+    eq(spooled.entry_count, 16)
+    with pytest.raises(IndexError):
+        spooled[0]
+
+
+@pytest.mark.parametrize('max_in_memory', [1, 3, 100])
+def test_sorted_spooled_batch(batches, max_in_memory):
+    in_memory, spooled = batches
+    for batch in batches:
+        batch.entry_records[-1].add_remittance('x' * 100)
+        batch.sort_entries(pyach.sorting.amount, max_in_memory)
+        batch.finalize()
+    assert spooled.is_spooled
+    eq(''.join(spooled.records()), ''.join(in_memory.records()))
+    eq([entry.entry_number for entry in spooled.entry_records], list(range(1, 11)))
+    eq(spooled.entry_hash, in_memory.entry_hash)
+
+
+def test_spooling_after_partial_iteration(batches):
+    in_memory, spooled = batches
+    next(iter(spooled.entry_records))
+    add_entries(in_memory)
+    add_entries(spooled)
+    eq(len(spooled.entry_records), 20)
+    entries = list(spooled.entry_records)
+    eq(len(entries), 20)
+    eq([entry.trace_number for entry in entries], [entry.trace_number for entry in in_memory.entry_records])
+    in_memory.finalize()
+    spooled.finalize()
+    eq(''.join(spooled.records()), ''.join(in_memory.records()))
+
+
+def test_close_removes_spool(fixed_dates):
+    with pyach.ACHRecordTypes.ACHFile() as ach_file:
+        ach_file.new_batch(DFI_NUMBER, BATCH_NAME, spool_after=2)
+        add_entries(ach_file.batch_records[-1])
+        spool = ach_file.batch_records[-1].entry_records._spool
+        assert not spool.closed
+    assert spool.closed
@@ -0,0 +1,59 @@
+import gzip
+import hashlib
+import io
+
+import pytest
+
+import pyach.streams
+from pyach.tests.test_ACHFile import eq
+
+
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('buffer_size', [100, pyach.streams.BUFFER_SIZE])
+def test_save_with_streams(populated_ach_file, tmp_path, monkeypatch, buffer_size):
+    monkeypatch.setattr(pyach.streams, 'BUFFER_SIZE', buffer_size)
+    path = str(tmp_path / 'ach.txt')
+    sha256 = pyach.streams.HashStream()
+    md5 = pyach.streams.HashStream('md5')
+    archive = pyach.streams.GzipStream(path + '.gz')
+    populated_ach_file.save(path, [sha256, md5, archive])
+    data = read_bytes(path)
+    eq(len(data), 40 * 95 - 1)
+    eq(sha256.hexdigest, hashlib.sha256(data).hexdigest())
+    eq(md5.hexdigest, hashlib.md5(data).hexdigest())
+    with gzip.open(archive.path) as file:
+        eq(file.read(), data)
+
+
+def test_save_without_streams_is_unchanged(populated_ach_file, tmp_path):
+    plain, streamed = str(tmp_path / 'plain.txt'), str(tmp_path / 'streamed.txt')
+    populated_ach_file.save(plain)
+    populated_ach_file.save(streamed, [pyach.streams.HashStream()])
+    plain, streamed = read_bytes(plain), read_bytes(streamed)
+    eq((plain[33:34], streamed[33:34]), (b'A', b'B'))  # Each save uses the next file ID modifier.
+    eq(streamed[:33] + streamed[34:], plain[:33] + plain[34:])
+
+
+def test_zstd_stream(populated_ach_file, tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    path = str(tmp_path / 'ach.txt')
+    archive = pyach.streams.ZstdStream(path + '.zst')
+    populated_ach_file.save(path, [archive])
+    with open(archive.path, 'rb') as file:
+        eq(zstandard.ZstdDecompressor().stream_reader(file).read(), read_bytes(path))
+
+
+def test_streams_see_translated_newlines():
+    raw = io.BytesIO()
+    file = io.TextIOWrapper(raw, 'ascii', newline='\r\n')
+    sha256 = pyach.streams.HashStream()
+    with pyach.streams.StreamWriter(file, [sha256], newline='\r\n') as writer:
+        writer.write('1' * 94 + '\n')
+        writer.write('9' * 94)
+    file.flush()
+    eq(raw.getvalue(), b'1' * 94 + b'\r\n' + b'9' * 94)
+    eq(sha256.hexdigest, hashlib.sha256(raw.getvalue()).hexdigest())